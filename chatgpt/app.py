@@ -1,43 +1,232 @@
 """
 Main Gradio application for the ChatGPT clone.
 """
+import asyncio
+import functools
 import gradio as gr
 import os
-from typing import List, Dict, Optional, Tuple
+import threading
+from collections import Counter
+from typing import AsyncIterator, Final, List, Dict, NamedTuple, Optional, Tuple
 from conversation_manager import ConversationManager
 from project_manager import ProjectManager
-import config
+from config import CONFIG
+
+
+# Custom CSS to mimic ChatGPT font styling and sidebar
+_CUSTOM_CSS: Final[str] = """
+/* ChatGPT-like font styling */
+* {
+    font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", "Roboto", "Oxygen", 
+                 "Ubuntu", "Cantarell", "Fira Sans", "Droid Sans", "Helvetica Neue", 
+                 sans-serif !important;
+}
+
+/* Better text rendering */
+body {
+    -webkit-font-smoothing: antialiased;
+    -moz-osx-font-smoothing: grayscale;
+}
+
+/* Chat message styling */
+.message {
+    font-size: 16px;
+    line-height: 1.5;
+}
+
+/* Input box styling */
+textarea {
+    font-size: 16px;
+}
+
+/* Conversation list sidebar styling */
+.gr-radio-group {
+    background-color: transparent !important;
+    border: none !important;
+    padding: 0 !important;
+}
+
+.gr-radio-group label {
+    display: block !important;
+    padding: 10px 12px !important;
+    margin: 4px 0 !important;
+    border-radius: 8px !important;
+    cursor: pointer !important;
+    transition: background-color 0.2s ease !important;
+    border: 1px solid transparent !important;
+}
+
+.gr-radio-group label:hover {
+    background-color: rgba(0, 0, 0, 0.05) !important;
+}
+
+.gr-radio-group input[type="radio"]:checked + label,
+.gr-radio-group label.selected {
+    background-color: rgba(0, 0, 0, 0.1) !important;
+    font-weight: 500 !important;
+}
+
+/* Hide radio buttons */
+.gr-radio-group input[type="radio"] {
+    display: none !important;
+}
+
+/* Sidebar column styling */
+.gr-column:first-child {
+    background-color: #f9f9f9;
+    padding: 16px;
+    border-right: 1px solid #e0e0e0;
+}
+"""
+
+# Static UI content, built once at import
+_HEADER_MARKDOWN: Final[str] = f"# {CONFIG.APP_TITLE}"
+_MODEL_CHOICES: Final[Tuple[str, ...]] = CONFIG.AVAILABLE_MODELS
+_TOOL_CHOICES: Final[Tuple[str, ...]] = CONFIG.AVAILABLE_TOOLS
+
+# Message roles shown in the chat window
+_DISPLAY_ROLES: Final[frozenset] = frozenset(("user", "assistant"))
+
+
+def _nonblank(text: Optional[str]) -> bool:
+    """Check that text has a non-whitespace character without copying it."""
+    return bool(text) and not text.isspace()
+
+
+@functools.lru_cache(maxsize=None)
+def _shared_semantic_cache():
+    """Semantic cache shared by all sessions, or None when it is disabled."""
+    if not CONFIG.ENABLE_SEMANTIC_CACHE:
+        return None
+    from semantic_cache import SemanticCache
+    return SemanticCache(
+        dim=CONFIG.EMBEDDING_DIM,
+        threshold=CONFIG.SEMANTIC_CACHE_THRESHOLD,
+        path=CONFIG.SEMANTIC_CACHE_FILE
+    )
+
+
+def _disambiguate_names(names: List[str]) -> List[str]:
+    """
+    Make display names unique by numbering names that occur more than once.
+    
+    Args:
+        names: Display names, possibly with duplicates
+        
+    Returns:
+        Names in the same order, with duplicates suffixed as "name (1)", "name (2)", ...
+    """
+    counts = Counter(names)
+    seen: Dict[str, int] = {}
+    unique_names = []
+    for name in names:
+        if counts[name] > 1:
+            seen[name] = seen.get(name, 0) + 1
+            name = f"{name} ({seen[name]})"
+        unique_names.append(name)
+    return unique_names
+
+
+class _Snapshot(NamedTuple):
+    """Sidebar choices for one request, as (label, id) pairs."""
+    project_choices: List[Tuple[str, str]]
+    conversation_choices: List[Tuple[str, str]]
+
+
+class _Session:
+    """
+    State for one browser session, held in a gr.State.
+    
+    Each session gets its own project selection, conversation and message
+    history, so concurrent users don't overwrite each other's state.
+    """
+    
+    __slots__ = ("project_id", "conversation_id", "saved_len", "_conversation_manager")
+    
+    def __init__(self, project_id: Optional[str]):
+        self.project_id = project_id
+        self.conversation_id: Optional[str] = None
+        # Number of messages of the current conversation already on disk, for append-only saves
+        self.saved_len: Optional[int] = None
+        self._conversation_manager: Optional[ConversationManager] = None
+    
+    @property
+    def conversation_manager(self) -> ConversationManager:
+        """Conversation manager for this session, created on first use."""
+        if self._conversation_manager is None:
+            self._conversation_manager = ConversationManager(
+                api_key=CONFIG.OPENAI_API_KEY,
+                semantic_cache=_shared_semantic_cache(),
+                embedding_model=CONFIG.EMBEDDING_MODEL
+            )
+        return self._conversation_manager
 
 
 class ChatGPTApp:
     """Main application class for the ChatGPT clone."""
     
+    __slots__ = (
+        "project_manager",
+        "project_id_to_name",
+        "_default_project_id",
+        "_default_model",
+        "_enable_streaming",
+        "_projects_cache_dirty",
+        "_cached_project_choices",
+        "_conversations_cache_dirty",
+        "_cached_conversation_choices",
+        "_sidebar_lock",
+    )
+    
     def __init__(self):
         """Initialize the application."""
-        self.conversation_manager = ConversationManager(api_key=config.OPENAI_API_KEY)
-        self.project_manager = ProjectManager(data_dir=config.DATA_DIR)
+        self.project_manager = ProjectManager(data_dir=CONFIG.DATA_DIR)
+        
+        # Project display names by ID; the dropdown and list use IDs as their values
+        self.project_id_to_name: Dict[str, str] = {}
         
-        # Application state
-        self.current_project_id: Optional[str] = None
-        self.current_conversation_id: Optional[str] = None
+        # Config values read by event handlers, bound once
+        self._default_model: str = CONFIG.DEFAULT_MODEL
+        self._enable_streaming: bool = CONFIG.ENABLE_STREAMING
         
-        # Mappings for dropdown display names to IDs
-        self.project_name_to_id: Dict[str, str] = {}
-        self.conversation_title_to_id: Dict[str, str] = {}
+        # Cached sidebar choices shared by all sessions, rebuilt only after a
+        # change marks them dirty. Handlers update them from worker threads, so
+        # refreshing and marking dirty happen under the lock; otherwise a change
+        # marked during a refresh could be overwritten by its stale listing
+        self._sidebar_lock = threading.RLock()
+        self._projects_cache_dirty = True
+        self._cached_project_choices: List[Tuple[str, str]] = []
+        self._conversations_cache_dirty: Dict[str, bool] = {}
+        self._cached_conversation_choices: Dict[str, Tuple[List[Tuple[str, str]], Dict[str, str]]] = {}
         
         # Create default project if none exist
         projects = self.project_manager.list_projects()
         if not projects:
-            self.current_project_id = self.project_manager.create_project(
-                name=config.DEFAULT_PROJECT_NAME,
+            self._default_project_id = self.project_manager.create_project(
+                name=CONFIG.DEFAULT_PROJECT_NAME,
                 description="Default project for conversations"
             )
         else:
-            self.current_project_id = projects[0]["id"]
+            self._default_project_id = projects[0]["id"]
+            # Reuse this listing for the first dropdown build
+            self._refresh_project_choices(projects)
     
-    def create_new_conversation(
+    def refresh_sidebar(self, session: _Session) -> Tuple[gr.Dropdown, gr.Radio]:
+        """
+        Rebuild the sidebar for a session, e.g. when its page loads.
+        
+        Returns:
+            Tuple of (project_dropdown, conversation_list)
+        """
+        snap = self._snapshot(session.project_id)
+        return (
+            self._get_project_dropdown(session.project_id, snap),
+            self._get_conversation_list(session.project_id, snap)
+        )
+    
+    async def create_new_conversation(
         self, 
-        project_dropdown: str,
+        session: _Session,
         model_dropdown: str,
         tools_checkboxes: List[str]
     ) -> Tuple[List, str, str, gr.Radio]:
@@ -48,137 +237,218 @@ class ChatGPTApp:
             Tuple of (chat_history, status_message, conversation_info, updated_conversation_dropdown)
         """
         # Create new conversation
-        conv_id = self.conversation_manager.create_conversation(
+        conv_id = session.conversation_manager.create_conversation(
             model=model_dropdown,
             tools=tools_checkboxes
         )
-        self.current_conversation_id = conv_id
+        session.conversation_id = conv_id
+        session.saved_len = None
         
-        # Add to current project
-        self.project_manager.add_conversation(
-            project_id=self.current_project_id,
+        # Add to current project; disk I/O runs off the event loop
+        await asyncio.to_thread(
+            self.project_manager.add_conversation,
+            project_id=session.project_id,
             conversation_id=conv_id,
             title="New Conversation"
         )
+        self._mark_conversations_dirty(session.project_id)
         
-        # Save the initial empty conversation immediately
-        self._save_current_conversation()
+        # Nothing is written to disk until the first message is sent
         
         # Get updated conversation dropdown and reset selection
-        updated_dropdown = self._get_conversation_list()
+        updated_dropdown = await asyncio.to_thread(self._get_conversation_list, session.project_id)
         
         return [], "New conversation created!", "Conversation: New Conversation", updated_dropdown
     
-    def send_message(
+    async def send_message(
         self, 
+        session: _Session,
         message: str, 
-        chat_history: List,
         temperature: float,
         max_tokens: int
-    ) -> Tuple[List, str]:
+    ) -> AsyncIterator[Tuple[List, str]]:
         """
-        Send a message and get response.
+        Send a message and stream the response into the chat.
         
-        Returns:
+        Yields:
             Tuple of (updated_chat_history, empty_input)
         """
-        if not message.strip():
-            return chat_history, ""
+        if not _nonblank(message):
+            yield gr.update(), ""
+            return
         
-        if not self.current_conversation_id:
+        conversation_manager = session.conversation_manager
+        
+        if not session.conversation_id:
             # Create a new conversation if none exists
-            self.current_conversation_id = self.conversation_manager.create_conversation()
-            self.project_manager.add_conversation(
-                project_id=self.current_project_id,
-                conversation_id=self.current_conversation_id,
-                title=message[:50]  # Use first part of message as title
+            session.conversation_id = conversation_manager.create_conversation()
+            session.saved_len = None
+            await asyncio.to_thread(
+                self.project_manager.add_conversation,
+                project_id=session.project_id,
+                conversation_id=session.conversation_id,
+                title=message[:50].strip() or "Untitled"  # Use first part of message as title
             )
+            self._mark_conversations_dirty(session.project_id)
         
-        # Add user message to chat history
+        # The conversation manager holds the history; this display list only
+        # lives for this response, with the new turn shown ahead of the reply
+        chat_history = self._get_chat_history_for_display(session)
         chat_history.append({"role": "user", "content": message})
         
-        # Get response from API
-        response = self.conversation_manager.send_message(
-            user_input=message,
-            temperature=temperature,
-            max_tokens=max_tokens
-        )
-        
-        # Add assistant response to chat history
-        if response["success"]:
-            chat_history.append({"role": "assistant", "content": response["content"]})
+        if not self._enable_streaming:
+            # Get response from API without blocking the event loop
+            response = await conversation_manager.send_message_async(
+                user_input=message,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
             
-            # Save conversation to project
-            self._save_current_conversation()
-        else:
-            error_msg = f"Error: {response.get('error', 'Unknown error')}"
-            chat_history.append({"role": "assistant", "content": error_msg})
+            # Add assistant response to chat history
+            if response["success"]:
+                chat_history.append({"role": "assistant", "content": response["content"]})
+                
+                # Save conversation to project
+                await self._save_conversation(session)
+            else:
+                error_msg = f"Error: {response.get('error', 'Unknown error')}"
+                chat_history.append({"role": "assistant", "content": error_msg})
+            
+            yield chat_history, ""
+            return
         
-        return chat_history, ""
+        # Show the user message right away, then fill in the reply as it streams
+        chat_history.append({"role": "assistant", "content": ""})
+        yield chat_history, ""
+        
+        try:
+            async for delta in conversation_manager.stream_message_async(
+                user_input=message,
+                temperature=temperature,
+                max_tokens=max_tokens
+            ):
+                chat_history[-1]["content"] += delta
+                yield chat_history, ""
+        except Exception as e:
+            chat_history[-1]["content"] = f"Error: {e}"
+            yield chat_history, ""
+        finally:
+            # Save conversation to project
+            await self._save_conversation(session)
     
-    def _save_current_conversation(self):
-        """Save current conversation to the current project."""
-        if not self.current_conversation_id or not self.current_project_id:
+    async def _save_conversation(self, session: _Session):
+        """Save the session's conversation to its project without blocking the event loop."""
+        if not session.conversation_id or not session.project_id:
             return
         
-        # Get conversation data
-        conversation_data = {
-            "conversation_id": self.current_conversation_id,
-            "model": self.conversation_manager.model,
-            "tools": self.conversation_manager.tools,
-            "metadata": self.conversation_manager.metadata,
-            "messages": self.conversation_manager.messages
-        }
-        
-        # Save to project
-        self.project_manager.save_conversation_to_project(
-            project_id=self.current_project_id,
-            conversation_id=self.current_conversation_id,
-            conversation_data=conversation_data
-        )
+        conv_id = session.conversation_id
+        project_id = session.project_id
+        conversation_manager = session.conversation_manager
+        messages = conversation_manager.messages
+        saved_len = session.saved_len
+        # Captured before awaiting, since the handler may move on meanwhile
+        new_len = len(messages)
+        
+        if saved_len is not None and saved_len <= new_len:
+            # Only append the messages added since the last save
+            if saved_len == new_len:
+                return
+            await asyncio.to_thread(
+                self.project_manager.append_messages,
+                project_id=project_id,
+                conversation_id=conv_id,
+                messages=messages[saved_len:new_len]
+            )
+        else:
+            # Get conversation data
+            conversation_data = {
+                "conversation_id": conv_id,
+                "model": conversation_manager.model,
+                "tools": conversation_manager.tools,
+                "metadata": conversation_manager.metadata,
+                "messages": messages[:new_len]
+            }
+            
+            # Save to project
+            await asyncio.to_thread(
+                self.project_manager.save_conversation_to_project,
+                project_id=project_id,
+                conversation_id=conv_id,
+                conversation_data=conversation_data
+            )
+        
+        if session.conversation_id == conv_id:
+            session.saved_len = new_len
+        
+        # Saving bumps last_modified, which reorders the conversation list
+        self._mark_conversations_dirty(project_id)
     
-    def load_conversation(self, conversation_name: str) -> Tuple[List, str, str]:
+    async def load_conversation(self, session: _Session, conv_id: Optional[str]) -> Tuple[List, str, str]:
         """
         Load a conversation from the current project.
         
         Returns:
             Tuple of (chat_history, status_message, conversation_info)
         """
-        if not conversation_name or conversation_name == "Select a conversation":
+        if not conv_id:
             return [], "No conversation selected", "No conversation"
         
-        # Get conversation ID from mapping
-        conv_id = self.conversation_title_to_id.get(conversation_name)
-        if not conv_id:
+        project_id = session.project_id
+        is_current = conv_id == session.conversation_id
+        
+        def read_conversation():
+            # Listing the titles scans the project directory too, so both
+            # reads happen in one call off the event loop
+            title = self._conversation_titles(project_id).get(conv_id)
+            if title is None or is_current:
+                return title, None
+            return title, self.project_manager.load_conversation_from_project(
+                project_id=project_id,
+                conversation_id=conv_id
+            )
+        
+        conversation_name, conv_data = await asyncio.to_thread(read_conversation)
+        if conversation_name is None:
             return [], "Invalid conversation selection", "No conversation"
         
-        # Load conversation data
-        conv_data = self.project_manager.load_conversation_from_project(
-            project_id=self.current_project_id,
-            conversation_id=conv_id
-        )
+        # Already showing this conversation; nothing to reload. The status is
+        # left alone so e.g. a rename's message isn't overwritten when the
+        # reselected entry fires this handler.
+        if is_current:
+            return gr.update(), gr.update(), gr.update()
         
-        if not conv_data:
-            return [], f"Failed to load conversation {conv_id}", "No conversation"
+        # Conversations are only written once they have messages, so a
+        # listed conversation without a file is simply still empty
+        is_saved = conv_data is not None
+        if not is_saved:
+            conv_data = {}
         
         # Restore conversation manager state
-        self.current_conversation_id = conv_id
-        self.conversation_manager.conversation_id = conv_id
-        self.conversation_manager.model = conv_data.get("model", config.DEFAULT_MODEL)
-        self.conversation_manager.tools = conv_data.get("tools", [])
-        self.conversation_manager.metadata = conv_data.get("metadata", {})
-        self.conversation_manager.messages = conv_data.get("messages", [])
+        conversation_manager = session.conversation_manager
+        session.conversation_id = conv_id
+        conversation_manager.conversation_id = conv_id
+        conversation_manager.model = conv_data.get("model", self._default_model)
+        conversation_manager.tools = conv_data.get("tools", [])
+        conversation_manager.metadata = conv_data.get("metadata", {})
+        conversation_manager.messages = conv_data.get("messages", [])
+        conversation_manager.restore_response_id()
+        session.saved_len = len(conversation_manager.messages) if is_saved else None
         
         # Build chat history for display
-        chat_history = []
-        for msg in self.conversation_manager.messages:
-            if msg["role"] in ["user", "assistant"]:
-                chat_history.append({
-                    "role": msg["role"],
-                    "content": msg["content"]
-                })
-        
-        return chat_history, f"Loaded conversation: {conversation_name}", f"Conversation: {conversation_name}"
+        return self._get_chat_history_for_display(session), f"Loaded conversation: {conversation_name}", f"Conversation: {conversation_name}"
+    
+    def _get_chat_history_for_display(self, session: _Session) -> List[Dict[str, str]]:
+        """
+        Build the Chatbot value from the session's conversation messages.
+        
+        The message contents are shared, not copied; only the role and
+        content fields are passed on, leaving out timestamps.
+        """
+        return [
+            {"role": msg["role"], "content": msg["content"]}
+            for msg in session.conversation_manager.messages
+            if msg["role"] in _DISPLAY_ROLES
+        ]
     
     def create_new_project(self, project_name: str, project_description: str) -> Tuple[gr.Dropdown, str]:
         """
@@ -187,248 +457,275 @@ class ChatGPTApp:
         Returns:
             Tuple of (updated_project_dropdown, status_message)
         """
-        if not project_name.strip():
-            return self._get_project_dropdown(), "Project name cannot be empty"
+        if not _nonblank(project_name):
+            return gr.update(), "Project name cannot be empty"
         
         project_id = self.project_manager.create_project(
             name=project_name,
             description=project_description
         )
         
-        self.current_project_id = project_id
+        self._mark_projects_dirty()
         
-        return self._get_project_dropdown(), f"Created project: {project_name}"
+        # Selecting the new project fires switch_project, which loads its conversations
+        return self._get_project_dropdown(project_id), f"Created project: {project_name}"
     
-    def switch_project(self, project_name: str) -> Tuple[gr.Radio, str]:
+    def switch_project(self, session: _Session, proj_id: Optional[str]) -> Tuple[gr.Radio, str]:
         """
         Switch to a different project.
         
         Returns:
             Tuple of (updated_conversation_dropdown, status_message)
         """
-        if not project_name or project_name == "Select a project":
-            return self._get_conversation_list(), "No project selected"
-        
-        # Get project ID from mapping
-        proj_id = self.project_name_to_id.get(project_name)
         if not proj_id:
-            return self._get_conversation_list(), "Invalid project selection"
+            return gr.update(), "No project selected"
+        
+        project_name = self.project_id_to_name.get(proj_id)
+        if project_name is None:
+            return gr.update(), "Invalid project selection"
         
-        self.current_project_id = proj_id
+        # Already in this project; keep the current conversation list
+        if proj_id == session.project_id:
+            return gr.update(), gr.update()
+        
+        session.project_id = proj_id
         
         # Clear current conversation
-        self.current_conversation_id = None
-        self.conversation_manager.clear_history()
+        session.conversation_id = None
+        session.saved_len = None
+        session.conversation_manager.clear_history()
         
-        return self._get_conversation_list(), f"Switched to project: {project_name}"
+        return self._get_conversation_list(proj_id), f"Switched to project: {project_name}"
     
-    def _get_project_dropdown(self) -> gr.Dropdown:
-        """Get updated project dropdown choices."""
-        projects = self.project_manager.list_projects()
+    def _mark_projects_dirty(self):
+        """Mark the cached project choices for a rebuild on the next snapshot."""
+        with self._sidebar_lock:
+            self._projects_cache_dirty = True
+    
+    def _mark_conversations_dirty(self, project_id: str):
+        """Mark a project's cached conversation choices for a rebuild."""
+        with self._sidebar_lock:
+            self._conversations_cache_dirty[project_id] = True
+    
+    def _refresh_project_choices(self, projects: Optional[List[Dict]] = None):
+        """
+        Rebuild the cached project choices and mappings.
         
-        # Clear and rebuild the mapping
-        self.project_name_to_id.clear()
-        
-        choices = []
-        for p in projects:
-            name = p['name']
-            # Handle duplicate names by appending a counter
-            original_name = name
-            counter = 1
-            while name in self.project_name_to_id:
-                name = f"{original_name} ({counter})"
-                counter += 1
+        Args:
+            projects: Result of list_projects() if the caller already has it;
+                fetched from the project manager when None
+        """
+        with self._sidebar_lock:
+            if projects is None:
+                projects = self.project_manager.list_projects()
+            
+            # (label, id) choices, numbering duplicate names in the label only
+            names = _disambiguate_names([p['name'] for p in projects])
+            choices = [(name, p['id']) for name, p in zip(names, projects)]
+            
+            self.project_id_to_name = dict(zip((p['id'] for p in projects), names))
+            self._cached_project_choices = choices
+            self._projects_cache_dirty = False
+    
+    def _refresh_conversation_choices(self, project_id: str):
+        """Rebuild the cached conversation choices and mapping for a project."""
+        with self._sidebar_lock:
+            conversations = self.project_manager.list_conversations(project_id)
             
-            self.project_name_to_id[name] = p['id']
-            choices.append(name)
+            # (label, id) choices, numbering duplicate titles in the label only
+            titles = _disambiguate_names([c['title'] for c in conversations])
+            choices = [(title, c['id']) for title, c in zip(titles, conversations)]
+            id_to_title = dict(zip((c['id'] for c in conversations), titles))
+            
+            self._cached_conversation_choices[project_id] = (choices, id_to_title)
+            self._conversations_cache_dirty[project_id] = False
+    
+    def _conversation_titles(self, project_id: Optional[str]) -> Dict[str, str]:
+        """Get the conversation display titles by ID for a project."""
+        if not project_id:
+            return {}
+        with self._sidebar_lock:
+            if self._conversations_cache_dirty.get(project_id, True):
+                self._refresh_conversation_choices(project_id)
+            return self._cached_conversation_choices[project_id][1]
+    
+    def _snapshot(self, project_id: Optional[str]) -> _Snapshot:
+        """
+        Gather the sidebar state, doing all disk reads for a request in one place.
         
-        # Find current selection by ID
-        current_value = None
-        if self.current_project_id:
-            for name, proj_id in self.project_name_to_id.items():
-                if proj_id == self.current_project_id:
-                    current_value = name
-                    break
+        Only listings marked dirty since the last snapshot are re-read, so
+        building several components from one snapshot costs at most one
+        list_projects() and one list_conversations() call.
+        
+        Args:
+            project_id: Project whose conversations are listed
+            
+        Returns:
+            Snapshot of the project and conversation choices
+        """
+        with self._sidebar_lock:
+            if self._projects_cache_dirty:
+                self._refresh_project_choices()
+            
+            if not project_id:
+                return _Snapshot(self._cached_project_choices, [])
+            
+            if self._conversations_cache_dirty.get(project_id, True):
+                self._refresh_conversation_choices(project_id)
+            
+            return _Snapshot(self._cached_project_choices, self._cached_conversation_choices[project_id][0])
+    
+    def _get_project_dropdown(
+        self,
+        selected_id: Optional[str],
+        snap: Optional[_Snapshot] = None
+    ) -> gr.Dropdown:
+        """
+        Get updated project dropdown choices.
+        
+        Args:
+            selected_id: Project to select
+            snap: Snapshot already taken for this request; taken when None
+        """
+        if snap is None:
+            snap = self._snapshot(None)
+        
+        choices = snap.project_choices
+        
+        # Select the project by ID
+        if selected_id in self.project_id_to_name:
+            current_value = selected_id
+        else:
+            current_value = choices[0][1] if choices else ""
         
         return gr.Dropdown(
-            choices=["Select a project"] + choices,
-            value=current_value or (choices[0] if choices else "Select a project"),
+            choices=[("Select a project", "")] + choices,
+            value=current_value,
             label="Projects"
         )
     
-    def _get_conversation_list(self) -> gr.Radio:
-        """Get updated conversation list as Radio component."""
-        if not self.current_project_id:
-            return gr.Radio(choices=[], value=None, label="Conversations", interactive=True)
-        
-        conversations = self.project_manager.list_conversations(self.current_project_id)
-        
-        # Clear and rebuild the mapping
-        self.conversation_title_to_id.clear()
-        
-        choices = []
-        for c in conversations:
-            title = c['title']
-            # Handle duplicate titles by appending a counter
-            original_title = title
-            counter = 1
-            while title in self.conversation_title_to_id:
-                title = f"{original_title} ({counter})"
-                counter += 1
-            
-            self.conversation_title_to_id[title] = c['id']
-            choices.append(title)
+    def _get_conversation_list(
+        self,
+        project_id: Optional[str],
+        snap: Optional[_Snapshot] = None,
+        selected_id: Optional[str] = None
+    ) -> gr.Radio:
+        """
+        Get updated conversation list as Radio component.
+        
+        Args:
+            project_id: Project whose conversations are listed
+            snap: Snapshot already taken for this request; taken when None
+            selected_id: Conversation to keep selected, if any
+        """
+        if snap is None:
+            snap = self._snapshot(project_id)
         
         return gr.Radio(
-            choices=choices,
-            value=None,
+            choices=snap.conversation_choices,
+            value=selected_id if selected_id in self._conversation_titles(project_id) else None,
             label="Conversations",
             interactive=True
         )
     
-    def delete_conversation(self, conversation_name: str) -> Tuple[gr.Radio, str, List]:
+    async def delete_conversation(self, session: _Session, conv_id: Optional[str]) -> Tuple[gr.Radio, str, List]:
         """
         Delete a conversation.
         
         Returns:
-            Tuple of (updated_conversation_dropdown, status_message, empty_chat_history)
+            Tuple of (updated_conversation_dropdown, status_message, chat_history),
+            where chat_history is only cleared if the current conversation was deleted
         """
-        if not conversation_name or conversation_name == "Select a conversation":
-            return self._get_conversation_list(), "No conversation selected", []
-        
-        # Get conversation ID from mapping
-        conv_id = self.conversation_title_to_id.get(conversation_name)
         if not conv_id:
-            return self._get_conversation_list(), "Invalid conversation selection", []
-        
-        # Delete conversation
-        success = self.project_manager.remove_conversation(
-            project_id=self.current_project_id,
-            conversation_id=conv_id
-        )
+            return gr.update(), "No conversation selected", gr.update()
+        
+        project_id = session.project_id
+        
+        def remove_conversation():
+            # Look up, delete and re-list in one call off the event loop
+            title = self._conversation_titles(project_id).get(conv_id)
+            if title is None:
+                return None, False, None
+            if not self.project_manager.remove_conversation(
+                project_id=project_id,
+                conversation_id=conv_id
+            ):
+                return title, False, None
+            self._mark_conversations_dirty(project_id)
+            return title, True, self._get_conversation_list(project_id)
+        
+        conversation_name, success, updated_dropdown = await asyncio.to_thread(remove_conversation)
+        if conversation_name is None:
+            return gr.update(), "Invalid conversation selection", gr.update()
         
         if success:
             # Clear current conversation if it was deleted
-            if self.current_conversation_id == conv_id:
-                self.current_conversation_id = None
-                self.conversation_manager.clear_history()
+            chat_history = gr.update()
+            if session.conversation_id == conv_id:
+                session.conversation_id = None
+                session.saved_len = None
+                session.conversation_manager.clear_history()
+                chat_history = []
             
-            return self._get_conversation_list(), f"Deleted conversation: {conversation_name}", []
+            return updated_dropdown, f"Deleted conversation: {conversation_name}", chat_history
         else:
-            return self._get_conversation_list(), f"Failed to delete conversation", []
+            return gr.update(), f"Failed to delete conversation", gr.update()
     
-    def rename_conversation(self, conversation_name: str, new_title: str) -> Tuple[gr.Radio, str]:
+    async def rename_conversation(self, session: _Session, conv_id: Optional[str], new_title: str) -> Tuple[gr.Radio, str]:
         """
         Rename a conversation.
         
         Returns:
             Tuple of (updated_conversation_dropdown, status_message)
         """
-        if not conversation_name or conversation_name == "Select a conversation":
-            return self._get_conversation_list(), "No conversation selected"
-        
-        if not new_title.strip():
-            return self._get_conversation_list(), "New title cannot be empty"
-        
-        # Get conversation ID from mapping
-        conv_id = self.conversation_title_to_id.get(conversation_name)
         if not conv_id:
-            return self._get_conversation_list(), "Invalid conversation selection"
-        
-        # Rename conversation
-        success = self.project_manager.update_conversation_title(
-            project_id=self.current_project_id,
-            conversation_id=conv_id,
-            new_title=new_title.strip()
-        )
-        
-        if success:
-            return self._get_conversation_list(), f"Renamed conversation to: {new_title}"
-        else:
-            return self._get_conversation_list(), "Failed to rename conversation"
+            return gr.update(), "No conversation selected"
+        
+        if not _nonblank(new_title):
+            return gr.update(), "New title cannot be empty"
+        
+        project_id = session.project_id
+        
+        def rename():
+            # Look up, rename and re-list in one call off the event loop
+            if conv_id not in self._conversation_titles(project_id):
+                return gr.update(), "Invalid conversation selection"
+            if not self.project_manager.update_conversation_title(
+                project_id=project_id,
+                conversation_id=conv_id,
+                new_title=new_title.strip()
+            ):
+                return gr.update(), "Failed to rename conversation"
+            self._mark_conversations_dirty(project_id)
+            # Keep the renamed conversation selected under its new title
+            return self._get_conversation_list(project_id, selected_id=conv_id), f"Renamed conversation to: {new_title}"
+        
+        return await asyncio.to_thread(rename)
     
-    def clear_chat(self) -> Tuple[List, str]:
+    def clear_chat(self, session: _Session) -> Tuple[List, str]:
         """
         Clear current chat history.
         
         Returns:
             Tuple of (empty_chat_history, status_message)
         """
-        self.conversation_manager.clear_history()
+        session.conversation_manager.clear_history()
+        # The saved log no longer matches memory; rewrite it on the next save
+        session.saved_len = None
         return [], "Chat cleared"
     
     def build_interface(self) -> gr.Blocks:
         """Build and return the Gradio interface."""
+        # One snapshot serves both sidebar components
+        snap = self._snapshot(self._default_project_id)
         
-        # Custom CSS to mimic ChatGPT font styling and sidebar
-        custom_css = """
-        /* ChatGPT-like font styling */
-        * {
-            font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", "Roboto", "Oxygen", 
-                         "Ubuntu", "Cantarell", "Fira Sans", "Droid Sans", "Helvetica Neue", 
-                         sans-serif !important;
-        }
-        
-        /* Better text rendering */
-        body {
-            -webkit-font-smoothing: antialiased;
-            -moz-osx-font-smoothing: grayscale;
-        }
-        
-        /* Chat message styling */
-        .message {
-            font-size: 16px;
-            line-height: 1.5;
-        }
-        
-        /* Input box styling */
-        textarea {
-            font-size: 16px;
-        }
-        
-        /* Conversation list sidebar styling */
-        .gr-radio-group {
-            background-color: transparent !important;
-            border: none !important;
-            padding: 0 !important;
-        }
-        
-        .gr-radio-group label {
-            display: block !important;
-            padding: 10px 12px !important;
-            margin: 4px 0 !important;
-            border-radius: 8px !important;
-            cursor: pointer !important;
-            transition: background-color 0.2s ease !important;
-            border: 1px solid transparent !important;
-        }
-        
-        .gr-radio-group label:hover {
-            background-color: rgba(0, 0, 0, 0.05) !important;
-        }
-        
-        .gr-radio-group input[type="radio"]:checked + label,
-        .gr-radio-group label.selected {
-            background-color: rgba(0, 0, 0, 0.1) !important;
-            font-weight: 500 !important;
-        }
-        
-        /* Hide radio buttons */
-        .gr-radio-group input[type="radio"] {
-            display: none !important;
-        }
-        
-        /* Sidebar column styling */
-        .gr-column:first-child {
-            background-color: #f9f9f9;
-            padding: 16px;
-            border-right: 1px solid #e0e0e0;
-        }
-        """
-        
-        with gr.Blocks(title=config.APP_TITLE, theme=config.DEFAULT_THEME, css=custom_css) as app:
-            gr.Markdown(f"# {config.APP_TITLE}")
-            gr.Markdown(config.APP_DESCRIPTION)
+        with gr.Blocks(title=CONFIG.APP_TITLE, theme=CONFIG.DEFAULT_THEME, css=_CUSTOM_CSS) as app:
+            # Per-session state; Gradio gives every session its own deep copy,
+            # so the conversation manager is only created once a session uses it
+            session_state = gr.State(_Session(self._default_project_id))
+            
+            gr.Markdown(_HEADER_MARKDOWN)
+            gr.Markdown(CONFIG.APP_DESCRIPTION)
             
             with gr.Row():
                 # Left sidebar for projects and conversations
@@ -436,7 +733,7 @@ class ChatGPTApp:
                     gr.Markdown("### Projects")
                     
                     with gr.Group():
-                        project_dropdown = self._get_project_dropdown()
+                        project_dropdown = self._get_project_dropdown(self._default_project_id, snap)
                         
                         with gr.Accordion("Create New Project", open=False):
                             new_project_name = gr.Textbox(
@@ -453,7 +750,7 @@ class ChatGPTApp:
                     gr.Markdown("### Conversations")
                     
                     with gr.Group():
-                        conversation_list = self._get_conversation_list()
+                        conversation_list = self._get_conversation_list(self._default_project_id, snap)
                         
                         with gr.Row():
                             delete_conv_btn = gr.Button("Delete", variant="stop", scale=1)
@@ -470,7 +767,7 @@ class ChatGPTApp:
                 with gr.Column(scale=3):
                     chatbot = gr.Chatbot(
                         label="Chat",
-                        height=config.CHAT_HEIGHT,
+                        height=CONFIG.CHAT_HEIGHT,
                         type="messages"
                     )
                     
@@ -497,13 +794,13 @@ class ChatGPTApp:
                     gr.Markdown("### Settings")
                     
                     model_dropdown = gr.Dropdown(
-                        choices=config.AVAILABLE_MODELS,
-                        value=config.DEFAULT_MODEL,
+                        choices=_MODEL_CHOICES,
+                        value=CONFIG.DEFAULT_MODEL,
                         label="Model"
                     )
                     
                     tools_checkboxes = gr.CheckboxGroup(
-                        choices=config.AVAILABLE_TOOLS,
+                        choices=_TOOL_CHOICES,
                         label="Tools",
                         value=[]
                     )
@@ -511,7 +808,7 @@ class ChatGPTApp:
                     temperature_slider = gr.Slider(
                         minimum=0.0,
                         maximum=2.0,
-                        value=config.DEFAULT_TEMPERATURE,
+                        value=CONFIG.DEFAULT_TEMPERATURE,
                         step=0.1,
                         label="Temperature"
                     )
@@ -519,7 +816,7 @@ class ChatGPTApp:
                     max_tokens_slider = gr.Slider(
                         minimum=256,
                         maximum=8192,
-                        value=config.DEFAULT_MAX_TOKENS,
+                        value=CONFIG.DEFAULT_MAX_TOKENS,
                         step=256,
                         label="Max Tokens"
                     )
@@ -533,51 +830,59 @@ class ChatGPTApp:
             
             # Event handlers
             
+            # Show listings changed since the interface was built
+            app.load(
+                fn=self.refresh_sidebar,
+                inputs=[session_state],
+                outputs=[project_dropdown, conversation_list]
+            )
+            
             # Send message
             send_btn.click(
                 fn=self.send_message,
-                inputs=[msg_input, chatbot, temperature_slider, max_tokens_slider],
+                inputs=[session_state, msg_input, temperature_slider, max_tokens_slider],
                 outputs=[chatbot, msg_input]
             )
             
             msg_input.submit(
                 fn=self.send_message,
-                inputs=[msg_input, chatbot, temperature_slider, max_tokens_slider],
+                inputs=[session_state, msg_input, temperature_slider, max_tokens_slider],
                 outputs=[chatbot, msg_input]
             )
             
             # New conversation
             new_conv_btn.click(
                 fn=self.create_new_conversation,
-                inputs=[project_dropdown, model_dropdown, tools_checkboxes],
+                inputs=[session_state, model_dropdown, tools_checkboxes],
                 outputs=[chatbot, status_box, conversation_info, conversation_list]
             )
             
             # Auto-load conversation when selected from list
             conversation_list.change(
                 fn=self.load_conversation,
-                inputs=[conversation_list],
-                outputs=[chatbot, status_box, conversation_info]
+                inputs=[session_state, conversation_list],
+                outputs=[chatbot, status_box, conversation_info],
+                trigger_mode="always_last"
             )
             
             # Delete conversation
             delete_conv_btn.click(
                 fn=self.delete_conversation,
-                inputs=[conversation_list],
+                inputs=[session_state, conversation_list],
                 outputs=[conversation_list, status_box, chatbot]
             )
             
             # Rename conversation
             rename_conv_btn.click(
                 fn=self.rename_conversation,
-                inputs=[conversation_list, new_conversation_title],
+                inputs=[session_state, conversation_list, new_conversation_title],
                 outputs=[conversation_list, status_box]
             )
             
             # Clear chat
             clear_btn.click(
                 fn=self.clear_chat,
-                inputs=[],
+                inputs=[session_state],
                 outputs=[chatbot, status_box]
             )
             
@@ -589,12 +894,17 @@ class ChatGPTApp:
             )
             
             # Switch project
+            # Only the last change in a burst (e.g. arrow-key navigation) runs
             project_dropdown.change(
                 fn=self.switch_project,
-                inputs=[project_dropdown],
-                outputs=[conversation_list, status_box]
+                inputs=[session_state, project_dropdown],
+                outputs=[conversation_list, status_box],
+                trigger_mode="always_last"
             )
         
+        # Sessions no longer share state, so events can run concurrently
+        app.queue(default_concurrency_limit=CONFIG.DEFAULT_CONCURRENCY_LIMIT)
+        
         return app
     
     def launch(self, **kwargs):
@@ -606,7 +916,7 @@ class ChatGPTApp:
 def main():
     """Main entry point for the application."""
     # Check for API key
-    if not config.OPENAI_API_KEY:
+    if not CONFIG.OPENAI_API_KEY:
         print("Warning: OPENAI_API_KEY environment variable not set!")
         print("Please set your OpenAI API key:")
         print("  export OPENAI_API_KEY='your-api-key-here'")
@@ -1,57 +1,79 @@
 """
 Configuration file for the ChatGPT clone application.
+
+Settings live on the frozen ``AppConfig`` dataclass; use the shared
+``CONFIG`` instance, e.g. ``CONFIG.DEFAULT_MODEL``.
 """
 import os
-from typing import List
-
-# OpenAI API Configuration
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
-
-# Application Settings
-APP_TITLE = "ChatGPT Clone"
-APP_DESCRIPTION = "A ChatGPT clone using OpenAI Responses API and Gradio"
-
-# Data Storage
-DATA_DIR = "./data"
-PROJECTS_DIR = "./data/projects"
-
-# Model Settings
-DEFAULT_MODEL = "gpt-5"
-AVAILABLE_MODELS = [
-    "gpt-5",
-    "gpt-4o",
-    "gpt-4o-mini",
-    "gpt-4-turbo",
-    "gpt-4",
-    "gpt-3.5-turbo",
-]
-
-# Tool Settings
-AVAILABLE_TOOLS = [
-    "web_search",
-    "file_search",
-    "code_interpreter",
-]
-
-# Conversation Settings
-DEFAULT_TEMPERATURE = 1.0
-DEFAULT_MAX_TOKENS = 4096
-MAX_CONVERSATION_HISTORY = 100
-
-# UI Settings
-CHAT_HEIGHT = 600
-SIDEBAR_WIDTH = 300
-DEFAULT_THEME = "soft"  # Gradio theme
-
-# Streaming
-ENABLE_STREAMING = True
-STREAM_CHUNK_SIZE = 1024
-
-# Project Settings
-DEFAULT_PROJECT_NAME = "Default Project"
-MAX_PROJECT_NAME_LENGTH = 100
-MAX_CONVERSATION_TITLE_LENGTH = 200
-
-# File Upload Settings (for file_search tool)
-MAX_FILE_SIZE_MB = 100
-ALLOWED_FILE_TYPES = [".txt", ".pdf", ".docx", ".py", ".js", ".html", ".css", ".json", ".xml", ".md"]
+from dataclasses import dataclass, field
+from typing import Final, Tuple
+
+
+@dataclass(frozen=True, slots=True)
+class AppConfig:
+    """Immutable application settings."""
+
+    # OpenAI API Configuration
+    OPENAI_API_KEY: str = field(default_factory=lambda: os.getenv("OPENAI_API_KEY", ""))
+
+    # Application Settings
+    APP_TITLE: str = "ChatGPT Clone"
+    APP_DESCRIPTION: str = "A ChatGPT clone using OpenAI Responses API and Gradio"
+
+    # Data Storage
+    DATA_DIR: str = "./data"
+    PROJECTS_DIR: str = "./data/projects"
+
+    # Model Settings
+    DEFAULT_MODEL: str = "gpt-5"
+    AVAILABLE_MODELS: Tuple[str, ...] = (
+        "gpt-5",
+        "gpt-4o",
+        "gpt-4o-mini",
+        "gpt-4-turbo",
+        "gpt-4",
+        "gpt-3.5-turbo",
+    )
+
+    # Tool Settings
+    AVAILABLE_TOOLS: Tuple[str, ...] = (
+        "web_search",
+        "file_search",
+        "code_interpreter",
+    )
+
+    # Conversation Settings
+    DEFAULT_TEMPERATURE: float = 1.0
+    DEFAULT_MAX_TOKENS: int = 4096
+    MAX_CONVERSATION_HISTORY: int = 100
+
+    # UI Settings
+    CHAT_HEIGHT: int = 600
+    SIDEBAR_WIDTH: int = 300
+    DEFAULT_THEME: str = "soft"  # Gradio theme
+    DEFAULT_CONCURRENCY_LIMIT: int = 32  # Events of one kind run at once across sessions
+
+    # Streaming
+    ENABLE_STREAMING: bool = True
+    STREAM_CHUNK_SIZE: int = 1024
+
+    # Semantic Cache (reuses replies to near-duplicate prompts; off by default)
+    ENABLE_SEMANTIC_CACHE: bool = False
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95  # Minimum cosine similarity for a hit
+    SEMANTIC_CACHE_FILE: str = "./data/cache.npz"
+    EMBEDDING_MODEL: str = "text-embedding-3-small"
+    EMBEDDING_DIM: int = 1536
+
+    # Project Settings
+    DEFAULT_PROJECT_NAME: str = "Default Project"
+    MAX_PROJECT_NAME_LENGTH: int = 100
+    MAX_CONVERSATION_TITLE_LENGTH: int = 200
+
+    # File Upload Settings (for file_search tool)
+    MAX_FILE_SIZE_MB: int = 100
+    ALLOWED_FILE_TYPES: Tuple[str, ...] = (
+        ".txt", ".pdf", ".docx", ".py", ".js", ".html", ".css", ".json", ".xml", ".md"
+    )
+
+
+CONFIG: Final[AppConfig] = AppConfig()
@@ -1,29 +1,162 @@
 """
 Conversation Manager for handling stateful conversations with OpenAI Responses API.
 """
-import json
+import asyncio
+import functools
+import importlib.util
+import operator
 import os
+import time
+from dataclasses import dataclass, field, replace
 from datetime import datetime
-from typing import List, Dict, Optional, Any
-from openai import OpenAI
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Iterator, List, Dict, Optional, Tuple, Any
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI, OpenAIError
+
+from json_io import dump_json, json_line, load_json
+
+if TYPE_CHECKING:
+    from semantic_cache import SemanticCache
+
+# HTTP/2 needs the optional h2 package (installed by httpx[http2])
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Keep connections warm so follow-up and concurrent requests skip the TCP/TLS handshake
+_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=64, max_connections=200)
+
+
+def _new_http_clients() -> Tuple[httpx.Client, httpx.AsyncClient]:
+    """Pooled HTTP/2 clients, multiplexing requests over few connections."""
+    return (
+        DefaultHttpxClient(http2=_HTTP2_AVAILABLE, limits=_HTTP_LIMITS),
+        DefaultAsyncHttpxClient(http2=_HTTP2_AVAILABLE, limits=_HTTP_LIMITS),
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _shared_http_clients() -> Tuple[httpx.Client, httpx.AsyncClient]:
+    """
+    HTTP clients shared by all ConversationManagers, created on first use.
+    
+    Pooled async connections belong to the event loop that opened them, so
+    sharing suits an app serving every session from one loop, like Gradio.
+    """
+    return _new_http_clients()
+
+
+@dataclass(frozen=True, slots=True)
+class ModelCaps:
+    """Request parameters a model accepts."""
+    supports_temperature: bool = True
+    token_param: str = "max_output_tokens"  # Responses API name for the output token limit
+    default_max_tokens: Optional[int] = None  # Sent when the caller gives no limit
+
+
+# Models not listed get DEFAULT_CAPS
+DEFAULT_CAPS = ModelCaps()
+MODEL_CAPS: Dict[str, ModelCaps] = {
+    "gpt-5": ModelCaps(supports_temperature=False),  # GPT-5 rejects temperature
+    "gpt-4o": DEFAULT_CAPS,
+    "gpt-4o-mini": DEFAULT_CAPS,
+    "gpt-4-turbo": DEFAULT_CAPS,
+    "gpt-4": DEFAULT_CAPS,
+    "gpt-3.5-turbo": DEFAULT_CAPS,
+}
+
+
+@dataclass
+class StreamBuffer:
+    """
+    Coalesces streamed text so consumers get fewer, larger chunks.
+    
+    Text is released once the buffer holds max_chars characters, max_ms
+    milliseconds have passed since the last release, or (optionally) a
+    newline arrives. A ConversationManager copies its buffer for each stream.
+    """
+    max_chars: int = 64
+    max_ms: float = 40.0
+    flush_on_newline: bool = True
+    _parts: List[str] = field(default_factory=list, init=False, repr=False)
+    _size: int = field(default=0, init=False, repr=False)
+    _last_flush: float = field(default_factory=time.monotonic, init=False, repr=False)
+    
+    def push(self, text: str) -> Optional[str]:
+        """
+        Add text to the buffer.
+        
+        Returns:
+            The buffered text if it is time to release it, otherwise None
+        """
+        self._parts.append(text)
+        self._size += len(text)
+        if (
+            self._size >= self.max_chars
+            or (self.flush_on_newline and "\n" in text)
+            or (time.monotonic() - self._last_flush) * 1000 >= self.max_ms
+        ):
+            return self.flush()
+        return None
+    
+    def flush(self) -> str:
+        """Release and return everything buffered so far."""
+        text = "".join(self._parts)
+        self._parts.clear()
+        self._size = 0
+        self._last_flush = time.monotonic()
+        return text
+
+
+def _first_output_text(response: Any) -> Any:
+    """Text of the first content item of the first output message."""
+    return response.output[0].content[0].text
 
 
 class ConversationManager:
     """Manages conversations using OpenAI Responses API with stateful history."""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        semantic_cache: Optional["SemanticCache"] = None,
+        embedding_model: str = "text-embedding-3-small",
+        share_http_client: bool = True
+    ):
         """
         Initialize the conversation manager.
         
         Args:
             api_key: OpenAI API key. If None, will use OPENAI_API_KEY environment variable.
+            semantic_cache: Cache of replies to reuse for near-duplicate prompts
+                in non-streaming sends and stream_message_async; disabled when None
+            embedding_model: Model used to embed prompts for the semantic cache
+            share_http_client: Reuse the process-wide HTTP clients, so every
+                manager shares warm connections; otherwise open private ones
         """
-        self.client = OpenAI(api_key=api_key) if api_key else OpenAI()
+        self._owns_http_client = not share_http_client
+        http_client, async_http_client = (
+            _shared_http_clients() if share_http_client else _new_http_clients()
+        )
+        self.client = OpenAI(api_key=api_key or None, http_client=http_client)
+        self.async_client = AsyncOpenAI(api_key=api_key or None, http_client=async_http_client)
         self.conversation_id: Optional[str] = None
         self.messages: List[Dict[str, str]] = []
         self.model: str = "gpt-5"  # Default model
         self.tools: List[str] = []  # Tools like web_search, file_search
         self.metadata: Dict[str, Any] = {}
+        # ID of the latest API response; the server keeps the history up to it
+        self.last_response_id: Optional[str] = None
+        self.semantic_cache = semantic_cache
+        self.embedding_model = embedding_model
+        # Text accessor that worked for each response type, see _extract_content
+        self._extractors: Dict[type, Callable[[Any], Any]] = {}
+        # Settings for coalescing streamed text; copied for each stream
+        self.stream_buffer = StreamBuffer()
+        # Context sent when there is no response to continue from: a running
+        # summary of older messages, then the rest of the history verbatim
+        self.context_window: int = 6  # Recent messages never summarized
+        self.summarize_every: int = 10  # Older turns to collect before summarizing
+        self.summary_model: str = "gpt-4o-mini"
+        self._reset_summary()
         
     def create_conversation(
         self, 
@@ -46,10 +179,13 @@ class ConversationManager:
         self.tools = tools or []
         self.metadata = metadata or {}
         self.messages = []
+        self.last_response_id = None
+        self._reset_summary()
         
         # Generate a unique conversation ID
-        self.conversation_id = f"conv_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
-        self.metadata['created_at'] = datetime.now().isoformat()
+        now = datetime.now()
+        self.conversation_id = f"conv_{now.strftime('%Y%m%d_%H%M%S_%f')}"
+        self.metadata['created_at'] = now.isoformat()
         self.metadata['model'] = model
         
         return self.conversation_id
@@ -73,6 +209,252 @@ class ConversationManager:
         Returns:
             Response dictionary with message content and metadata
         """
+        if self._needs_summary():
+            self._summarize_history()
+        
+        if stream:
+            params = self._prepare_request(user_input, temperature, max_tokens)
+            response = self.client.responses.create(**params, stream=True)
+            return self._handle_streaming_response(response)
+        
+        # Reuse a cached reply to a near-identical prompt if there is one
+        cache_context = self._cache_context()
+        vector = self._embed(user_input) if cache_context is not None else None
+        cached = self._cache_lookup(vector, cache_context)
+        if cached is not None:
+            return self._handle_cached_reply(user_input, cached)
+        
+        # Call the Responses API
+        params = self._prepare_request(user_input, temperature, max_tokens)
+        response = self.client.responses.create(**params)
+        result = self._handle_response(response)
+        self._cache_add(vector, result["content"], cache_context)
+        return result
+    
+    async def send_message_async(
+        self, 
+        user_input: str,
+        stream: bool = False,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None
+    ) -> Any:
+        """
+        Send a message without blocking the event loop.
+        
+        Same as send_message, but awaits the AsyncOpenAI client so the
+        caller's event loop can serve other requests during the API call.
+        
+        Args:
+            user_input: The user's message
+            stream: Whether to stream the response
+            temperature: Sampling temperature (0-2)
+            max_tokens: Maximum tokens in response
+            
+        Returns:
+            Response dictionary with message content and metadata, or an
+            async generator of response chunks when streaming
+        """
+        if self._needs_summary():
+            await self._summarize_history_async()
+        
+        if stream:
+            params = self._prepare_request(user_input, temperature, max_tokens)
+            response_stream = await self.async_client.responses.create(**params, stream=True)
+            return self._handle_streaming_response_async(response_stream)
+        
+        # Reuse a cached reply to a near-identical prompt if there is one
+        cache_context = self._cache_context()
+        vector = await self._embed_async(user_input) if cache_context is not None else None
+        cached = self._cache_lookup(vector, cache_context)
+        if cached is not None:
+            return self._handle_cached_reply(user_input, cached)
+        
+        params = self._prepare_request(user_input, temperature, max_tokens)
+        response = await self.async_client.responses.create(**params)
+        result = self._handle_response(response)
+        await self._cache_add_async(vector, result["content"], cache_context)
+        return result
+    
+    async def stream_message_async(
+        self, 
+        user_input: str,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """
+        Send a message and stream the reply as it is generated.
+        
+        The assistant message is added to history once the stream completes.
+        
+        Args:
+            user_input: The user's message
+            temperature: Sampling temperature (0-2)
+            max_tokens: Maximum tokens in response
+            
+        Yields:
+            Text deltas of the assistant response
+        """
+        # A cached reply is yielded whole
+        cache_context = self._cache_context()
+        vector = await self._embed_async(user_input) if cache_context is not None else None
+        cached = self._cache_lookup(vector, cache_context)
+        if cached is not None:
+            self._handle_cached_reply(user_input, cached)
+            yield cached
+            return
+        
+        if self._needs_summary():
+            await self._summarize_history_async()
+        
+        params = self._prepare_request(user_input, temperature, max_tokens)
+        response_stream = await self.async_client.responses.create(**params, stream=True)
+        async for text in self._stream_text_async(response_stream):
+            yield text
+        await self._cache_add_async(vector, self.messages[-1]["content"], cache_context)
+    
+    def stream_text(
+        self, 
+        user_input: str,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None
+    ) -> Iterator[str]:
+        """
+        Send a message and stream the reply text as it is generated.
+        
+        Like send_message with stream=True, but yields bare strings rather
+        than response dictionaries; the end of iteration marks completion,
+        when the assistant message has been added to history.
+        
+        Args:
+            user_input: The user's message
+            temperature: Sampling temperature (0-2)
+            max_tokens: Maximum tokens in response
+            
+        Yields:
+            Chunks of the assistant response
+        """
+        # A cached reply is yielded whole
+        cache_context = self._cache_context()
+        vector = self._embed(user_input) if cache_context is not None else None
+        cached = self._cache_lookup(vector, cache_context)
+        if cached is not None:
+            self._handle_cached_reply(user_input, cached)
+            yield cached
+            return
+        
+        if self._needs_summary():
+            self._summarize_history()
+        
+        params = self._prepare_request(user_input, temperature, max_tokens)
+        response_stream = self.client.responses.create(**params, stream=True)
+        yield from self._stream_text(response_stream)
+        self._cache_add(vector, self.messages[-1]["content"], cache_context)
+    
+    async def send_messages_batch(
+        self,
+        inputs: List[str],
+        concurrency: int = 10,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Send independent prompts in parallel, e.g. to replay a dataset.
+        
+        Each prompt is a fresh single-turn request with the conversation's
+        model and tools; the conversation history is neither sent nor changed.
+        
+        Args:
+            inputs: Prompts to send
+            concurrency: Maximum number of requests in flight at once
+            temperature: Sampling temperature (0-2)
+            max_tokens: Maximum tokens in each response
+            
+        Returns:
+            One response dictionary per prompt, in input order; a failed
+            request gives {"success": False, "error": ...}
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def send_one(user_input: str) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    response = await self.async_client.responses.create(
+                        **self._request_params(user_input, temperature, max_tokens)
+                    )
+                except OpenAIError as e:
+                    return {"success": False, "error": str(e)}
+            return {"success": True, "content": self._extract_content(response)}
+        
+        return await asyncio.gather(*(send_one(user_input) for user_input in inputs))
+    
+    def submit_batch_file(
+        self,
+        inputs: List[str],
+        save_path: str,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None
+    ) -> str:
+        """
+        Submit independent prompts to the Batch API, for when latency doesn't matter.
+        
+        The requests are written to a JSONL file, uploaded, and run within
+        24 hours; the ith prompt's result has custom_id "request-{i}".
+        
+        Args:
+            inputs: Prompts to send
+            save_path: Where to write the JSONL request file
+            temperature: Sampling temperature (0-2)
+            max_tokens: Maximum tokens in each response
+            
+        Returns:
+            ID of the created batch
+        """
+        with open(save_path, 'wb') as f:
+            for i, user_input in enumerate(inputs):
+                f.write(json_line({
+                    "custom_id": f"request-{i}",
+                    "method": "POST",
+                    "url": "/v1/responses",
+                    "body": self._request_params(user_input, temperature, max_tokens)
+                }))
+        
+        with open(save_path, 'rb') as f:
+            batch_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/responses",
+            completion_window="24h"
+        )
+        return batch.id
+    
+    def close(self):
+        """Close the sync HTTP client, unless it is shared with other managers."""
+        if self._owns_http_client:
+            self.client.close()
+    
+    async def aclose(self):
+        """Close both HTTP clients, unless they are shared with other managers."""
+        if self._owns_http_client:
+            self.client.close()
+            await self.async_client.close()
+    
+    def _prepare_request(
+        self,
+        user_input: str,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Record the user message and build the Responses API parameters.
+        
+        Args:
+            user_input: The user's message
+            temperature: Sampling temperature (0-2)
+            max_tokens: Maximum tokens in response
+            
+        Returns:
+            Keyword arguments for responses.create
+        """
         if not self.conversation_id:
             self.create_conversation()
         
@@ -83,57 +465,135 @@ class ConversationManager:
             "timestamp": datetime.now().isoformat()
         })
         
-        # Prepare the request parameters
+        params = self._request_params(user_input, temperature, max_tokens)
+        
+        # Continue the server-side conversation, so earlier turns aren't resent
+        if self.last_response_id:
+            params["previous_response_id"] = self.last_response_id
+        elif len(self.messages) > 1:
+            # No response to continue from (e.g. history saved before response
+            # IDs were recorded); include the history as context instead
+            context = self._build_context()
+            if context:
+                # Prepend context to the input
+                params["input"] = f"{context}\n\nUser: {user_input}"
+        
+        return params
+    
+    def _request_params(
+        self,
+        user_input: str,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Build the Responses API parameters for a prompt, without any history."""
         params = {
             "model": self.model,
             "input": user_input,
         }
         
-        # Add optional parameters
-        # Note: GPT-5 doesn't support the temperature parameter
-        if temperature is not None and self.model != "gpt-5":
+        # Add optional parameters the model supports
+        caps = MODEL_CAPS.get(self.model, DEFAULT_CAPS)
+        if temperature is not None and caps.supports_temperature:
             params["temperature"] = temperature
+        if max_tokens is None:
+            max_tokens = caps.default_max_tokens
         if max_tokens is not None:
-            params["max_output_tokens"] = max_tokens  # Responses API uses max_output_tokens
+            params[caps.token_param] = max_tokens
         
         # Add tools if specified (convert string names to proper tool objects)
         if self.tools:
             params["tools"] = [{"type": tool} for tool in self.tools]
         
-        # Include conversation history as context
-        # Build context from previous messages and include it in the input
-        if len(self.messages) > 1:
-            # Build context from previous messages
-            context = self._build_context()
-            if context:
-                # Prepend context to the input
-                params["input"] = f"{context}\n\nUser: {user_input}"
-        
-        # Call the Responses API
-        if stream:
-            response = self.client.responses.create(**params, stream=True)
-            return self._handle_streaming_response(response)
-        else:
-            response = self.client.responses.create(**params)
-            return self._handle_response(response)            
+        return params
     
     def _build_context(self) -> Optional[str]:
         """
         Build context string from conversation history.
         
+        Messages already folded into the running summary are replaced by it,
+        which keeps the context bounded however long the conversation gets.
+        
         Returns:
             Context string or None
         """
         if len(self.messages) <= 1:
             return None
         
-        # Build context from previous messages (excluding the last user message)
-        context_parts = []
-        for msg in self.messages[:-1]:
-            if msg["role"] in ["user", "assistant"]:
-                context_parts.append(f"{msg['role']}: {msg['content']}")
+        # Build context from previous messages (excluding the last user message),
+        # formatting only those added since the last call when possible
+        start, end = self._context_span
+        stop = len(self.messages) - 1
+        if start != self.summary_upto or end > stop:
+            context_parts = [f"summary of earlier conversation: {self.summary}"] if self.summary else []
+            start = end = self.summary_upto
+        else:
+            context_parts = [self._context_prefix] if self._context_prefix else []
+        context_parts.extend(self._format_messages(self.messages[end:stop]))
         
-        return "\n".join(context_parts) if context_parts else None
+        self._context_prefix = "\n".join(context_parts)
+        self._context_span = (start, stop)
+        return self._context_prefix or None
+    
+    @staticmethod
+    def _format_messages(messages: List[Dict[str, Any]]) -> List[str]:
+        """Format user and assistant messages as "role: content" lines."""
+        return [
+            f"{msg['role']}: {msg['content']}"
+            for msg in messages
+            if msg["role"] in ["user", "assistant"]
+        ]
+    
+    def _reset_summary(self):
+        """Forget the running summary and cached context, e.g. when the history is replaced."""
+        self.summary: str = ""
+        self.summary_upto: int = 0  # Number of leading messages the summary covers
+        # Formatted context for messages[start:end], extended as messages are added
+        self._context_prefix: str = ""
+        self._context_span: Tuple[int, int] = (0, 0)
+    
+    def _pending_summary(self) -> List[Dict[str, Any]]:
+        """Messages older than the verbatim window that the summary doesn't cover yet."""
+        end = len(self.messages) - self.context_window
+        return self.messages[self.summary_upto:end]
+    
+    def _needs_summary(self) -> bool:
+        """Whether the next request sends context with enough unsummarized history to compact."""
+        if self.last_response_id is not None:
+            return False
+        return len(self._pending_summary()) >= 2 * self.summarize_every
+    
+    def _summary_request(self, pending: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Build the Responses API parameters to fold pending messages into the summary."""
+        prompt = (
+            "Summarize this conversation so it can stand in for the messages in "
+            "later turns. Keep facts, decisions, and open questions; be concise.\n\n"
+        )
+        if self.summary:
+            prompt += f"Summary so far:\n{self.summary}\n\n"
+        prompt += "New messages:\n" + "\n".join(self._format_messages(pending))
+        return {"model": self.summary_model, "input": prompt}
+    
+    def _summarize_history(self):
+        """Fold messages older than the verbatim window into the running summary."""
+        pending = self._pending_summary()
+        try:
+            response = self.client.responses.create(**self._summary_request(pending))
+        except OpenAIError:
+            # Keep sending those messages verbatim and try again next turn
+            return
+        self.summary = self._extract_content(response)
+        self.summary_upto += len(pending)
+    
+    async def _summarize_history_async(self):
+        """Async version of _summarize_history."""
+        pending = self._pending_summary()
+        try:
+            response = await self.async_client.responses.create(**self._summary_request(pending))
+        except OpenAIError:
+            return
+        self.summary = self._extract_content(response)
+        self.summary_upto += len(pending)
     
     def _handle_response(self, response: Any) -> Dict[str, Any]:
         """
@@ -151,11 +611,7 @@ class ConversationManager:
         content = self._extract_content(response)
         
         # Add assistant message to history
-        self.messages.append({
-            "role": "assistant",
-            "content": content,
-            "timestamp": datetime.now().isoformat()
-        })
+        self._add_assistant_message(content, getattr(response, "id", None))
         
         return {
             "success": True,
@@ -168,56 +624,297 @@ class ConversationManager:
         """
         Handle streaming response from Responses API.
         
+        Wraps _stream_text's chunks in response dictionaries; callers that
+        only need the text should iterate stream_text instead.
+        
         Args:
             response_stream: Streaming response from OpenAI
             
         Returns:
-            Generator yielding response chunks
+            Generator yielding response chunks, coalesced by stream_buffer
+        """
+        for text in self._stream_text(response_stream):
+            yield {
+                "success": True,
+                "content": text,
+                "is_chunk": True
+            }
+        
+        yield {
+            "success": True,
+            "content": self.messages[-1]["content"],
+            "is_complete": True,
+            "message_count": len(self.messages)
+        }
+    
+    def _stream_text(self, response_stream: Any) -> Iterator[str]:
+        """
+        Yield the text of a streaming response, coalesced by stream_buffer.
+        
+        The assistant message is added to history once the stream ends.
+        
+        Args:
+            response_stream: Streaming response from OpenAI
+            
+        Yields:
+            Chunks of the assistant response
         """
         full_content = []
+        response_id = None
+        buffer = replace(self.stream_buffer)
         
-        for chunk in response_stream:
-            chunk_content = self._extract_content(chunk)
-            if chunk_content:
-                full_content.append(chunk_content)
-                yield {
-                    "success": True,
-                    "content": chunk_content,
-                    "is_chunk": True
-                }
+        for event in response_stream:
+            if event.type == "response.output_text.delta":
+                text = buffer.push(event.delta)
+                if text:
+                    full_content.append(text)
+                    yield text
+            elif event.type == "response.completed":
+                response_id = event.response.id
+
+        # Release whatever is still buffered
+        text = buffer.flush()
+        if text:
+            full_content.append(text)
+            yield text
         
         # Add complete message to history
-        complete_content = "".join(full_content)
-        self.messages.append({
-            "role": "assistant",
-            "content": complete_content,
-            "timestamp": datetime.now().isoformat()
-        })
+        self._add_assistant_message("".join(full_content), response_id)
+    
+    async def _handle_streaming_response_async(self, response_stream: Any) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Handle an async streaming response from Responses API.
+        
+        Args:
+            response_stream: Async event stream from AsyncOpenAI
+            
+        Yields:
+            Response chunks coalesced by stream_buffer, ending with the complete message
+        """
+        async for text in self._stream_text_async(response_stream):
+            yield {
+                "success": True,
+                "content": text,
+                "is_chunk": True
+            }
         
         yield {
             "success": True,
-            "content": complete_content,
+            "content": self.messages[-1]["content"],
             "is_complete": True,
             "message_count": len(self.messages)
         }
-
+    
+    async def _stream_text_async(self, response_stream: Any) -> AsyncIterator[str]:
+        """Async version of _stream_text, for an AsyncOpenAI event stream."""
+        full_content = []
+        response_id = None
+        buffer = replace(self.stream_buffer)
+        
+        async for event in response_stream:
+            if event.type == "response.output_text.delta":
+                text = buffer.push(event.delta)
+                if text:
+                    full_content.append(text)
+                    yield text
+            elif event.type == "response.completed":
+                response_id = event.response.id
+        
+        # Release whatever is still buffered
+        text = buffer.flush()
+        if text:
+            full_content.append(text)
+            yield text
+        
+        # Add complete message to history
+        self._add_assistant_message("".join(full_content), response_id)
+    
+    def _embed(self, text: str) -> Optional[List[float]]:
+        """
+        Embed a prompt for the semantic cache.
+        
+        Returns:
+            The embedding, or None if the request failed
+        """
+        try:
+            response = self.client.embeddings.create(model=self.embedding_model, input=text)
+        except OpenAIError:
+            # The cache is only an optimization; send the message regardless
+            return None
+        return response.data[0].embedding
+    
+    async def _embed_async(self, text: str) -> Optional[List[float]]:
+        """Async version of _embed."""
+        try:
+            response = await self.async_client.embeddings.create(model=self.embedding_model, input=text)
+        except OpenAIError:
+            return None
+        return response.data[0].embedding
+    
+    def _cache_context(self) -> Optional[str]:
+        """
+        Key for the conversation state a new prompt follows.
+        
+        Replies are only reused under the same model and preceding response,
+        so a cached answer always fits the conversation it is returned into.
+        
+        Returns:
+            The key, or None if the semantic cache shouldn't be used: it is
+            disabled, or there is history the server doesn't hold
+        """
+        if self.semantic_cache is None:
+            return None
+        if self.last_response_id is None and self.messages:
+            return None
+        return f"{self.model}:{self.last_response_id or ''}"
+    
+    def _cache_lookup(self, vector: Optional[List[float]], context: Optional[str]) -> Optional[str]:
+        """Look up a cached reply, if caching is enabled and the prompt was embedded."""
+        if vector is None:
+            return None
+        return self.semantic_cache.lookup(vector, context)
+    
+    def _cache_add(self, vector: Optional[List[float]], content: str, context: Optional[str]):
+        """Cache a reply, if caching is enabled and the prompt was embedded."""
+        if vector is not None and content:
+            self.semantic_cache.add(vector, content, context)
+            if self.semantic_cache.save_due():
+                self.semantic_cache.flush()
+    
+    async def _cache_add_async(self, vector: Optional[List[float]], content: str, context: Optional[str]):
+        """Async version of _cache_add, saving the cache off the event loop."""
+        if vector is not None and content:
+            self.semantic_cache.add(vector, content, context)
+            if self.semantic_cache.save_due():
+                await asyncio.to_thread(self.semantic_cache.flush)
+    
+    def _handle_cached_reply(self, user_input: str, content: str) -> Dict[str, Any]:
+        """
+        Record a prompt answered from the semantic cache.
+        
+        Args:
+            user_input: The user's message
+            content: Cached assistant reply
+            
+        Returns:
+            Response dictionary like _handle_response's
+        """
+        if not self.conversation_id:
+            self.create_conversation()
+        
+        # Answered instantly, so both messages share one timestamp
+        timestamp = datetime.now().isoformat()
+        self.messages.append({
+            "role": "user",
+            "content": user_input,
+            "timestamp": timestamp
+        })
+        # The server never saw this turn, so the next request sends context instead
+        self._add_assistant_message(content, timestamp=timestamp)
+        
+        return {
+            "success": True,
+            "content": content,
+            "message_count": len(self.messages),
+            "cached": True
+        }
+    
+    def _add_assistant_message(
+        self,
+        content: str,
+        response_id: Any = None,
+        timestamp: Optional[str] = None
+    ):
+        """
+        Add an assistant reply to history and remember its response ID.
+        
+        Args:
+            content: Reply text
+            response_id: ID of the API response that produced it, if known
+            timestamp: ISO timestamp of the reply; the current time when None
+        """
+        message = {
+            "role": "assistant",
+            "content": content,
+            "timestamp": timestamp or datetime.now().isoformat()
+        }
+        
+        # Kept on the message so append-only message logs carry it too
+        if isinstance(response_id, str):
+            message["response_id"] = response_id
+            self.last_response_id = response_id
+        else:
+            # Without an ID the server-side chain is broken; fall back to context
+            self.last_response_id = None
+        
+        self.messages.append(message)
+    
+    def restore_response_id(self) -> Optional[str]:
+        """
+        Set last_response_id from the latest assistant message in history.
+        
+        Call after replacing messages, e.g. when loading a saved conversation.
+        This also drops the running summary of the previous messages.
+        
+        Returns:
+            The restored response ID, or None if there is none to continue from
+        """
+        self._reset_summary()
+        self.last_response_id = None
+        for msg in reversed(self.messages):
+            if msg["role"] == "assistant":
+                self.last_response_id = msg.get("response_id")
+                break
+        return self.last_response_id
     
     def _extract_content(self, response: Any) -> str:
         """
         Extract text content from response object.
         
+        The accessor that finds the text is remembered per response type, so
+        repeated calls (e.g. once per streamed chunk) skip the probing.
+        
         Args:
             response: Response from OpenAI Responses API
             
         Returns:
             Extracted text content as a plain string
         """
+        extractor = self._extractors.get(type(response))
+        if extractor is not None:
+            try:
+                content = extractor(response)
+            except (AttributeError, IndexError, TypeError):
+                content = None
+            if content is not None:
+                return content if type(content) is str else str(content)
+        
+        content, extractor = self._probe_content(response)
+        if extractor is not None:
+            self._extractors[type(response)] = extractor
+        return content
+    
+    @staticmethod
+    def _probe_content(response: Any) -> Tuple[str, Optional[Callable[[Any], Any]]]:
+        """
+        Find the text in a response by probing its structure.
+        
+        Args:
+            response: Response from OpenAI Responses API
+            
+        Returns:
+            Tuple of (text, accessor to reuse for this response type or None)
+        """
         # Handle Responses API structure
         # The SDK provides a convenient output_text property that aggregates text from output array
         
         # First try: use output_text convenience property (SDK-only, recommended)
         if hasattr(response, 'output_text') and response.output_text is not None:
-            return str(response.output_text)
+            output_text = response.output_text
+            return (
+                output_text if type(output_text) is str else str(output_text),
+                operator.attrgetter('output_text')
+            )
         
         # Second try: manually parse output array
         if hasattr(response, 'output') and response.output:
@@ -237,36 +934,57 @@ class ConversationManager:
                         
                         # Get the text attribute
                         if hasattr(first_content, 'text'):
-                            return str(first_content.text)
+                            return str(first_content.text), _first_output_text
                         else:
-                            return str(first_content)
+                            return str(first_content), None
                     elif isinstance(content_list, str):
-                        return content_list
+                        return content_list, None
                     else:
-                        return str(content_list)
+                        return str(content_list), None
                 
                 # Fallback: stringify the message
-                return str(first_message)            
+                return str(first_message), None
         
         # Last resort: convert entire response to string
-        return str(response)
+        return str(response), None
         
-    def get_history(self) -> List[Dict[str, str]]:
+    def get_history(self, copy: bool = False) -> List[Dict[str, str]]:
         """
         Get conversation history.
         
+        Args:
+            copy: Return a snapshot of the list instead of the live history
+            
         Returns:
-            List of message dictionaries
+            List of message dictionaries; unless copy is True, this is the
+            manager's own list, so don't modify it
         """
-        return self.messages.copy()
+        return self.messages.copy() if copy else self.messages
     
     def clear_history(self):
         """Clear conversation history while keeping the conversation ID."""
         self.messages = []
+        self.last_response_id = None
+        self._reset_summary()
+    
+    @staticmethod
+    def append_message_to_file(filepath: str, message: Dict[str, Any]):
+        """
+        Append a message to a JSONL message log, one JSON object per line.
+        
+        Persisting a turn this way writes only the new message, however long
+        the conversation already is.
+        
+        Args:
+            filepath: Path of the .jsonl log
+            message: Message to append
+        """
+        with open(filepath, 'ab') as f:
+            f.write(json_line(message))
     
     def save_conversation(self, filepath: str):
         """
-        Save conversation to a JSON file.
+        Save the whole conversation to a JSON file, e.g. for a one-shot export.
         
         Args:
             filepath: Path to save the conversation
@@ -276,12 +994,12 @@ class ConversationManager:
             "model": self.model,
             "tools": self.tools,
             "metadata": self.metadata,
+            "last_response_id": self.last_response_id,
             "messages": self.messages
         }
         
         os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(conversation_data, f, indent=2, ensure_ascii=False)
+        dump_json(conversation_data, filepath)
     
     def load_conversation(self, filepath: str):
         """
@@ -290,14 +1008,15 @@ class ConversationManager:
         Args:
             filepath: Path to the conversation file
         """
-        with open(filepath, 'r', encoding='utf-8') as f:
-            conversation_data = json.load(f)
+        conversation_data = load_json(filepath)
         
         self.conversation_id = conversation_data.get("conversation_id")
         self.model = conversation_data.get("model", "gpt-5")
         self.tools = conversation_data.get("tools", [])
         self.metadata = conversation_data.get("metadata", {})
         self.messages = conversation_data.get("messages", [])
+        self._reset_summary()
+        self.last_response_id = conversation_data.get("last_response_id") or self.restore_response_id()
     
     def set_model(self, model: str):
         """
@@ -0,0 +1,80 @@
+"""
+JSON file helpers shared by the conversation and project managers.
+
+Uses orjson when it is installed and falls back to the standard library.
+Files are replaced atomically, via a temporary file and os.replace.
+"""
+import json
+import os
+from pathlib import Path
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library
+    orjson = None
+
+PathLike = Union[str, Path]
+
+
+def dumps(data: Any, indent: bool = True) -> bytes:
+    """
+    Serialize data as UTF-8 JSON.
+    
+    Args:
+        data: JSON-serializable data; non-string dict keys are converted to strings
+        indent: Indent with two spaces; otherwise emit one compact line
+    
+    Returns:
+        Encoded JSON document
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, option=option)
+    return json.dumps(data, indent=2 if indent else None, ensure_ascii=False).encode('utf-8')
+
+
+def loads(data: bytes) -> Any:
+    """Parse a JSON document from UTF-8 bytes."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def atomic_write_bytes(path: PathLike, data: bytes, durable: bool = False):
+    """
+    Replace the contents of path without ever exposing a partial write.
+    
+    The data goes to a temporary file that is then renamed over path, so a
+    crash leaves either the old or the new contents.
+    
+    Args:
+        path: File to write
+        data: New contents
+        durable: Also fsync the data before renaming, so it survives a power loss
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        if durable:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def dump_json(data: Any, path: PathLike, durable: bool = False):
+    """Atomically write data to path as indented UTF-8 JSON."""
+    atomic_write_bytes(path, dumps(data), durable=durable)
+
+
+def load_json(path: PathLike) -> Any:
+    """Read JSON data from path."""
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+
+def json_line(data: Any) -> bytes:
+    """Serialize data as one compact JSON line for a .jsonl log."""
+    return dumps(data, indent=False) + b"\n"
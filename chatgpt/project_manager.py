@@ -1,20 +1,43 @@
 """
 Project Manager for organizing conversations into projects.
 """
-import json
+import functools
 import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Tuple
 from pathlib import Path
 
+from json_io import atomic_write_bytes, dump_json, json_line, load_json, loads
+
+
+def _locked(method):
+    """Run a ProjectManager method while holding the manager's lock."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
 
 class ProjectManager:
     """Manages projects and their associated conversations."""
     
+    # Parsed project.json files kept in memory, least recently used evicted first
+    PROJECT_CACHE_SIZE = 128
+    
+    # Threads used to read many project files at once
+    IO_WORKERS = 16
+    
     def __init__(self, data_dir: str = "./data"):
         """
         Initialize the project manager.
         
+        Projects are discovered by scanning the projects directory, so each
+        project.json is the only record of its project.
+        
         Args:
             data_dir: Directory to store project data
         """
@@ -22,22 +45,75 @@ class ProjectManager:
         self.projects_dir = self.data_dir / "projects"
         self.projects_dir.mkdir(parents=True, exist_ok=True)
         
-        # Load or initialize projects index
-        self.index_file = self.data_dir / "projects_index.json"
-        self.projects_index = self._load_index()
+        # Serializes read-modify-write updates from concurrent sessions
+        self._lock = threading.RLock()
+        
+        # Listing entries by project ID, with the project.json mtime they were read at
+        self._summaries: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+        
+        # Listing cache, invalidated whenever the underlying file is written
+        self._convs_cache: Dict[str, List[Dict[str, Any]]] = {}
+        
+        # Parsed projects; mutators update these dicts in place and write them back
+        self._project_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        
+        # Flat title index for search_conversations, rebuilt after any project write
+        self._all_convs: Optional[List[Tuple[str, Dict[str, Any]]]] = None
+        
+        # Created on first use
+        self._io_pool: Optional[ThreadPoolExecutor] = None
+    
+    def _project_file(self, project_id: str) -> Path:
+        """Path of a project's metadata file."""
+        return self.projects_dir / project_id / "project.json"
+    
+    def _project_ids(self) -> List[str]:
+        """IDs of the projects on disk."""
+        with os.scandir(self.projects_dir) as it:
+            return [entry.name for entry in it if entry.is_dir()]
+    
+    def _summarize(self, project: Dict[str, Any]):
+        """Record a project's listing entry as of its file's current mtime."""
+        mtime = os.stat(self._project_file(project["id"])).st_mtime_ns
+        self._summaries[project["id"]] = (mtime, {
+            "id": project["id"],
+            "name": project["name"],
+            "description": project.get("description", ""),
+            "created_at": project.get("created_at", ""),
+            "conversation_count": len(project.get("conversations", []))
+        })
     
-    def _load_index(self) -> Dict[str, Any]:
-        """Load projects index from file."""
-        if self.index_file.exists():
-            with open(self.index_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {"projects": {}}
+    def _save_project(self, project: Dict[str, Any]):
+        """Save a project's metadata file and keep it cached."""
+        dump_json(project, self._project_file(project["id"]))
+        self._cache_project(project)
+        self._summarize(project)
+        self._convs_cache.pop(project["id"], None)
+        self._all_convs = None
     
-    def _save_index(self):
-        """Save projects index to file."""
-        with open(self.index_file, 'w', encoding='utf-8') as f:
-            json.dump(self.projects_index, f, indent=2, ensure_ascii=False)
+    def _cache_project(self, project: Dict[str, Any]):
+        """Store a parsed project, evicting the least recently used if full."""
+        self._project_cache[project["id"]] = project
+        self._project_cache.move_to_end(project["id"])
+        if len(self._project_cache) > self.PROJECT_CACHE_SIZE:
+            self._project_cache.popitem(last=False)
     
+    @_locked
+    def reload(self, project_id: str):
+        """
+        Drop cached data for a project so it is read from disk again.
+        
+        Call this after project.json has been changed by another process.
+        
+        Args:
+            project_id: Project identifier
+        """
+        self._project_cache.pop(project_id, None)
+        self._summaries.pop(project_id, None)
+        self._convs_cache.pop(project_id, None)
+        self._all_convs = None
+    
+    @_locked
     def create_project(self, name: str, description: str = "") -> str:
         """
         Create a new project.
@@ -49,13 +125,14 @@ class ProjectManager:
         Returns:
             project_id: Unique identifier for the project
         """
-        project_id = f"proj_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+        now = datetime.now()
+        project_id = f"proj_{now.strftime('%Y%m%d_%H%M%S_%f')}"
         
         project_data = {
             "id": project_id,
             "name": name,
             "description": description,
-            "created_at": datetime.now().isoformat(),
+            "created_at": now.isoformat(),
             "conversations": []
         }
         
@@ -64,21 +141,11 @@ class ProjectManager:
         project_dir.mkdir(parents=True, exist_ok=True)
         
         # Save project metadata
-        project_file = project_dir / "project.json"
-        with open(project_file, 'w', encoding='utf-8') as f:
-            json.dump(project_data, f, indent=2, ensure_ascii=False)
-        
-        # Update index
-        self.projects_index["projects"][project_id] = {
-            "name": name,
-            "description": description,
-            "created_at": project_data["created_at"],
-            "conversation_count": 0
-        }
-        self._save_index()
+        self._save_project(project_data)
         
         return project_id
     
+    @_locked
     def get_project(self, project_id: str) -> Optional[Dict[str, Any]]:
         """
         Get project details.
@@ -87,33 +154,73 @@ class ProjectManager:
             project_id: Project identifier
             
         Returns:
-            Project data dictionary or None if not found
+            Project data dictionary, shared with the cache; don't modify it.
+            None if not found
         """
-        project_file = self.projects_dir / project_id / "project.json"
-        if not project_file.exists():
+        project = self._project_cache.get(project_id)
+        if project is not None:
+            self._project_cache.move_to_end(project_id)
+            return project
+        
+        project = self._load_project_raw(project_id)
+        if project is not None:
+            self._cache_project(project)
+        return project
+    
+    def _load_project_raw(self, project_id: str) -> Optional[Dict[str, Any]]:
+        """Read a project.json from disk, bypassing the cache; safe to call from any thread."""
+        try:
+            return load_json(self._project_file(project_id))
+        except FileNotFoundError:
             return None
-        
-        with open(project_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
     
+    def _get_projects(self, project_ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """Like get_project for several projects, reading uncached files in parallel."""
+        missing = [pid for pid in project_ids if pid not in self._project_cache]
+        if len(missing) > 1:
+            if self._io_pool is None:
+                self._io_pool = ThreadPoolExecutor(
+                    max_workers=self.IO_WORKERS, thread_name_prefix="project-io"
+                )
+            for project in self._io_pool.map(self._load_project_raw, missing):
+                if project is not None:
+                    self._cache_project(project)
+        
+        # Cached now, unless evicted again by a very large batch
+        return [self.get_project(pid) for pid in project_ids]
+    
+    @_locked
     def list_projects(self) -> List[Dict[str, Any]]:
         """
         List all projects.
         
+        Only project.json files whose mtime changed since they were last
+        listed are parsed, so changes made by other processes show up too.
+        
         Returns:
-            List of project dictionaries
+            List of project dictionaries, shared with the cache; don't modify them
         """
         projects = []
-        for project_id, project_info in self.projects_index["projects"].items():
-            projects.append({
-                "id": project_id,
-                **project_info
-            })
+        for project_id in self._project_ids():
+            try:
+                mtime = os.stat(self._project_file(project_id)).st_mtime_ns
+            except FileNotFoundError:
+                continue
+            
+            cached = self._summaries.get(project_id)
+            if cached is None or cached[0] != mtime:
+                self.reload(project_id)
+                project = self.get_project(project_id)
+                if not project:
+                    continue
+                self._summarize(project)
+            projects.append(self._summaries[project_id][1])
         
         # Sort by created_at descending
         projects.sort(key=lambda x: x.get("created_at", ""), reverse=True)
         return projects
     
+    @_locked
     def delete_project(self, project_id: str) -> bool:
         """
         Delete a project and all its conversations.
@@ -131,14 +238,14 @@ class ProjectManager:
         # Delete all files in project directory
         import shutil
         shutil.rmtree(project_dir)
-        
-        # Remove from index
-        if project_id in self.projects_index["projects"]:
-            del self.projects_index["projects"][project_id]
-            self._save_index()
+        self._project_cache.pop(project_id, None)
+        self._summaries.pop(project_id, None)
+        self._convs_cache.pop(project_id, None)
+        self._all_convs = None
         
         return True
     
+    @_locked
     def add_conversation(
         self, 
         project_id: str, 
@@ -166,27 +273,22 @@ class ProjectManager:
                 return False
         
         # Add conversation
+        now_iso = datetime.now().isoformat()
         conversation_entry = {
             "id": conversation_id,
             "title": title,
-            "created_at": datetime.now().isoformat(),
-            "last_modified": datetime.now().isoformat()
+            "created_at": now_iso,
+            "last_modified": now_iso
         }
         
         project["conversations"].append(conversation_entry)
         
         # Save project
-        project_file = self.projects_dir / project_id / "project.json"
-        with open(project_file, 'w', encoding='utf-8') as f:
-            json.dump(project, f, indent=2, ensure_ascii=False)
-        
-        # Update index
-        if project_id in self.projects_index["projects"]:
-            self.projects_index["projects"][project_id]["conversation_count"] = len(project["conversations"])
-            self._save_index()
+        self._save_project(project)
         
         return True
     
+    @_locked
     def remove_conversation(self, project_id: str, conversation_id: str) -> bool:
         """
         Remove a conversation from a project.
@@ -209,22 +311,17 @@ class ProjectManager:
         ]
         
         # Save project
-        project_file = self.projects_dir / project_id / "project.json"
-        with open(project_file, 'w', encoding='utf-8') as f:
-            json.dump(project, f, indent=2, ensure_ascii=False)
-        
-        # Delete conversation file
-        conv_file = self.projects_dir / project_id / f"{conversation_id}.json"
-        if conv_file.exists():
-            conv_file.unlink()
+        self._save_project(project)
         
-        # Update index
-        if project_id in self.projects_index["projects"]:
-            self.projects_index["projects"][project_id]["conversation_count"] = len(project["conversations"])
-            self._save_index()
+        # Delete conversation files
+        for suffix in (".json", ".jsonl"):
+            conv_file = self.projects_dir / project_id / f"{conversation_id}{suffix}"
+            if conv_file.exists():
+                conv_file.unlink()
         
         return True
     
+    @_locked
     def list_conversations(self, project_id: str) -> List[Dict[str, Any]]:
         """
         List all conversations in a project.
@@ -233,17 +330,26 @@ class ProjectManager:
             project_id: Project identifier
             
         Returns:
-            List of conversation dictionaries
+            List of conversation dictionaries, shared with the cache; don't modify it
         """
+        cached = self._convs_cache.get(project_id)
+        if cached is not None:
+            return cached
+        
         project = self.get_project(project_id)
         if not project:
             return []
         
-        # Sort by last_modified descending
-        conversations = project.get("conversations", [])
-        conversations.sort(key=lambda x: x.get("last_modified", ""), reverse=True)
+        # Sort by last_modified descending, leaving the cached project's order alone
+        conversations = sorted(
+            project.get("conversations", []),
+            key=lambda x: x.get("last_modified", ""),
+            reverse=True
+        )
+        self._convs_cache[project_id] = conversations
         return conversations
     
+    @_locked
     def save_conversation_to_project(
         self, 
         project_id: str, 
@@ -251,7 +357,10 @@ class ProjectManager:
         conversation_data: Dict[str, Any]
     ) -> bool:
         """
-        Save conversation data to a project.
+        Save conversation data to a project, rewriting any existing files.
+        
+        Metadata is stored in {conversation_id}.json and messages in an
+        append-only {conversation_id}.jsonl log, one message per line.
         
         Args:
             project_id: Project identifier
@@ -265,24 +374,64 @@ class ProjectManager:
         if not project:
             return False
         
-        # Save conversation file
+        # Save conversation metadata
+        metadata = {k: v for k, v in conversation_data.items() if k != "messages"}
         conv_file = self.projects_dir / project_id / f"{conversation_id}.json"
-        with open(conv_file, 'w', encoding='utf-8') as f:
-            json.dump(conversation_data, f, indent=2, ensure_ascii=False)
+        dump_json(metadata, conv_file)
+        
+        # Rewrite the message log
+        messages_file = self.projects_dir / project_id / f"{conversation_id}.jsonl"
+        atomic_write_bytes(
+            messages_file,
+            b"".join(json_line(message) for message in conversation_data.get("messages", []))
+        )
+        
+        self._touch_conversation(project, conversation_id)
+        return True
+    
+    @_locked
+    def append_messages(
+        self, 
+        project_id: str, 
+        conversation_id: str,
+        messages: List[Dict[str, Any]]
+    ) -> bool:
+        """
+        Append new messages to a saved conversation's message log.
+        
+        Only the new messages are written, so the cost of a save does not
+        grow with the length of the conversation.
+        
+        Args:
+            project_id: Project identifier
+            conversation_id: Conversation identifier
+            messages: Messages added since the last save
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        project = self.get_project(project_id)
+        if not project:
+            return False
+        
+        messages_file = self.projects_dir / project_id / f"{conversation_id}.jsonl"
+        with open(messages_file, 'ab') as f:
+            f.writelines(json_line(message) for message in messages)
         
-        # Update conversation metadata in project
+        self._touch_conversation(project, conversation_id)
+        return True
+    
+    def _touch_conversation(self, project: Dict[str, Any], conversation_id: str):
+        """Update a conversation's last_modified time and save the project."""
         for conv in project["conversations"]:
             if conv["id"] == conversation_id:
                 conv["last_modified"] = datetime.now().isoformat()
                 break
         
         # Save project
-        project_file = self.projects_dir / project_id / "project.json"
-        with open(project_file, 'w', encoding='utf-8') as f:
-            json.dump(project, f, indent=2, ensure_ascii=False)
-        
-        return True
+        self._save_project(project)
     
+    @_locked
     def load_conversation_from_project(
         self, 
         project_id: str, 
@@ -302,9 +451,19 @@ class ProjectManager:
         if not conv_file.exists():
             return None
         
-        with open(conv_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        conversation_data = load_json(conv_file)
+        
+        # Older saves keep messages inline; newer messages live in the log
+        messages = conversation_data.get("messages", [])
+        messages_file = self.projects_dir / project_id / f"{conversation_id}.jsonl"
+        if messages_file.exists():
+            with open(messages_file, 'rb') as f:
+                messages.extend(loads(line) for line in f if line.strip())
+        conversation_data["messages"] = messages
+        
+        return conversation_data
     
+    @_locked
     def update_conversation_title(
         self, 
         project_id: str, 
@@ -336,12 +495,11 @@ class ProjectManager:
             return False
         
         # Save project
-        project_file = self.projects_dir / project_id / "project.json"
-        with open(project_file, 'w', encoding='utf-8') as f:
-            json.dump(project, f, indent=2, ensure_ascii=False)
+        self._save_project(project)
         
         return True
     
+    @_locked
     def rename_project(self, project_id: str, new_name: str) -> bool:
         """
         Rename a project.
@@ -360,14 +518,7 @@ class ProjectManager:
         project["name"] = new_name
         
         # Save project
-        project_file = self.projects_dir / project_id / "project.json"
-        with open(project_file, 'w', encoding='utf-8') as f:
-            json.dump(project, f, indent=2, ensure_ascii=False)
-        
-        # Update index
-        if project_id in self.projects_index["projects"]:
-            self.projects_index["projects"][project_id]["name"] = new_name
-            self._save_index()
+        self._save_project(project)
         
         return True
     
@@ -379,25 +530,37 @@ class ProjectManager:
             query: Search query
             
         Returns:
-            List of matching conversations with project info
+            List of matching conversations with project info, most recently
+            modified first
         """
-        results = []
         query_lower = query.lower()
-        
-        for project_id in self.projects_index["projects"]:
-            project = self.get_project(project_id)
+        return [
+            dict(result) for title_lower, result in self._conversation_index()
+            if query_lower in title_lower
+        ]
+    
+    @_locked
+    def _conversation_index(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Build (or reuse) the list of (lowercased title, search result) pairs."""
+        if self._all_convs is not None:
+            return self._all_convs
+        
+        index = []
+        project_ids = self._project_ids()
+        for project_id, project in zip(project_ids, self._get_projects(project_ids)):
             if not project:
                 continue
             
             for conv in project.get("conversations", []):
-                # Search in conversation title
-                if query_lower in conv.get("title", "").lower():
-                    results.append({
-                        "project_id": project_id,
-                        "project_name": project["name"],
-                        "conversation_id": conv["id"],
-                        "conversation_title": conv["title"],
-                        "last_modified": conv.get("last_modified", "")
-                    })
-        
-        return results
+                index.append((conv.get("title", "").lower(), {
+                    "project_id": project_id,
+                    "project_name": project["name"],
+                    "conversation_id": conv["id"],
+                    "conversation_title": conv["title"],
+                    "last_modified": conv.get("last_modified", "")
+                }))
+        
+        # Sort once here rather than per query
+        index.sort(key=lambda entry: entry[1]["last_modified"], reverse=True)
+        self._all_convs = index
+        return index
@@ -0,0 +1,199 @@
+"""
+Semantic cache that reuses assistant replies for near-duplicate prompts.
+"""
+import atexit
+import os
+import threading
+import zlib
+from pathlib import Path
+from typing import List, Optional, Union
+
+import numpy as np
+
+
+def _context_hash(context: str) -> int:
+    """Stable hash of a context key, for vectorized filtering."""
+    return zlib.crc32(context.encode('utf-8'))
+
+
+class SemanticCache:
+    """
+    Stores replies keyed by L2-normalized prompt embeddings.
+    
+    A lookup returns the cached reply whose prompt has the highest cosine
+    similarity to the query, if it reaches the threshold. Entries are
+    partitioned by a context key, so a reply is only reused where the
+    preceding conversation was the same.
+    """
+    
+    def __init__(
+        self,
+        dim: int = 1536,
+        threshold: float = 0.9,
+        path: Optional[Union[str, Path]] = None,
+        save_every: int = 32
+    ):
+        """
+        Initialize the cache.
+        
+        Args:
+            dim: Embedding dimension
+            threshold: Minimum cosine similarity for a cache hit
+            path: .npz file to load from and save to; kept in memory only when None
+            save_every: Number of added entries after which a save is due
+        """
+        self.dim = dim
+        self.threshold = threshold
+        self.path = Path(path) if path else None
+        self.save_every = save_every
+        
+        # Guards the entries while a save snapshots them from another thread
+        self._lock = threading.Lock()
+        # Serializes writes, which share a temporary file
+        self._save_lock = threading.Lock()
+        self._unsaved = 0
+        
+        # Rows [0, _size) are in use; capacity grows by doubling
+        self._size = 0
+        self._vectors = np.empty((16, dim), dtype=np.float32)
+        self._context_hashes = np.empty(16, dtype=np.uint32)
+        self._contexts: List[str] = []
+        self._responses: List[str] = []
+        
+        if self.path is not None:
+            if self.path.exists():
+                self.load()
+            # Entries added since the last due save are written at exit
+            atexit.register(self.flush)
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    def _normalize(self, vector) -> np.ndarray:
+        """Convert an embedding to a unit-length float32 vector."""
+        vector = np.asarray(vector, dtype=np.float32)
+        if vector.shape != (self.dim,):
+            raise ValueError(f"Expected an embedding of shape ({self.dim},), got {vector.shape}")
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+    
+    def lookup(self, vector, context: str = "") -> Optional[str]:
+        """
+        Find a cached reply for a prompt embedding.
+        
+        Args:
+            vector: Embedding of the prompt
+            context: Key of the conversation state the prompt follows
+        
+        Returns:
+            Cached reply, or None on a miss
+        """
+        if not self._size:
+            return None
+        
+        query = self._normalize(vector)
+        scores = self._vectors[:self._size] @ query
+        scores[self._context_hashes[:self._size] != _context_hash(context)] = -np.inf
+        
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold or self._contexts[best] != context:
+            return None
+        return self._responses[best]
+    
+    def add(self, vector, response: str, context: str = ""):
+        """
+        Cache a reply.
+        
+        The cache isn't saved here, since writing it costs time proportional
+        to its size; callers save it with flush once save_due says so.
+        
+        Args:
+            vector: Embedding of the prompt
+            response: Assistant reply to the prompt
+            context: Key of the conversation state the prompt follows
+        """
+        vector = self._normalize(vector)
+        with self._lock:
+            if self._size == len(self._vectors):
+                self._grow(2 * len(self._vectors))
+            
+            self._vectors[self._size] = vector
+            self._context_hashes[self._size] = _context_hash(context)
+            self._contexts.append(context)
+            self._responses.append(response)
+            self._size += 1
+            self._unsaved += 1
+    
+    def save_due(self) -> bool:
+        """Whether save_every entries were added since the cache was last saved to its path."""
+        return self.path is not None and self._unsaved >= self.save_every
+    
+    def flush(self):
+        """Save the cache to its path if entries were added since it was last saved."""
+        if self.path is not None and self._unsaved:
+            self.save()
+    
+    def _grow(self, capacity: int):
+        """Resize the backing arrays to hold capacity entries."""
+        vectors = np.empty((capacity, self.dim), dtype=np.float32)
+        vectors[:self._size] = self._vectors[:self._size]
+        context_hashes = np.empty(capacity, dtype=np.uint32)
+        context_hashes[:self._size] = self._context_hashes[:self._size]
+        self._vectors = vectors
+        self._context_hashes = context_hashes
+    
+    def save(self, path: Optional[Union[str, Path]] = None):
+        """
+        Save the cache to an .npz file.
+        
+        Args:
+            path: Destination; defaults to the cache's own path
+        """
+        path = Path(path) if path else self.path
+        if path is None:
+            raise ValueError("No path to save the semantic cache to")
+        
+        with self._save_lock:
+            # Snapshot the entries, so adds can continue while the file is written
+            with self._lock:
+                vectors = self._vectors[:self._size].copy()
+                contexts = self._contexts[:]
+                responses = self._responses[:]
+                if path == self.path:
+                    self._unsaved = 0
+            
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(path.name + ".tmp")
+            with open(tmp_path, 'wb') as f:
+                np.savez(
+                    f,
+                    vectors=vectors,
+                    contexts=np.array(contexts, dtype=str),
+                    responses=np.array(responses, dtype=str)
+                )
+            os.replace(tmp_path, path)
+    
+    def load(self, path: Optional[Union[str, Path]] = None):
+        """
+        Replace the cache contents with those saved in an .npz file.
+        
+        Args:
+            path: Source; defaults to the cache's own path
+        """
+        path = Path(path) if path else self.path
+        with np.load(path) as data:
+            vectors = data["vectors"].astype(np.float32)
+            contexts = data["contexts"].tolist()
+            responses = data["responses"].tolist()
+        
+        if vectors.ndim != 2 or vectors.shape[1] != self.dim:
+            raise ValueError(f"Cached embeddings in {path} don't have dimension {self.dim}")
+        
+        self._size = len(vectors)
+        self._vectors = np.empty((max(16, self._size), self.dim), dtype=np.float32)
+        self._vectors[:self._size] = vectors
+        self._context_hashes = np.empty(len(self._vectors), dtype=np.uint32)
+        self._context_hashes[:self._size] = [_context_hash(c) for c in contexts]
+        self._contexts = contexts
+        self._responses = responses
+        self._unsaved = 0
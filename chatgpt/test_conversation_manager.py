@@ -8,300 +8,520 @@ This script tests the ConversationManager class functionality including:
 - File save/load operations
 - GPT-5 specific behavior (temperature parameter exclusion)
 """
+import asyncio
 import os
 import sys
 import json
-import tempfile
-import unittest
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import AsyncMock, Mock, patch, MagicMock
 from datetime import datetime
 
+import pytest
+
 # Add parent directory to path if running directly
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from conversation_manager import ConversationManager
+from conversation_manager import ConversationManager, StreamBuffer
+from openai import OpenAIError
+from openai.types.responses import Response, ResponseCompletedEvent, ResponseTextDeltaEvent
+
+
+@pytest.fixture(scope="class")
+def openai_mocks():
+    """Patch the OpenAI clients once per test class to avoid real API calls."""
+    with patch('conversation_manager.OpenAI') as openai, patch('conversation_manager.AsyncOpenAI') as async_openai:
+        yield openai, async_openai
+
+
+@pytest.fixture
+def manager(openai_mocks):
+    """A ConversationManager with fresh mocked clients, so tests don't share mock state."""
+    openai, async_openai = openai_mocks
+    openai.return_value = MagicMock()
+    async_openai.return_value = MagicMock()
+    return ConversationManager(api_key="test_key")
+
 
+@pytest.fixture(scope="session")
+def mock_response():
+    """A Responses API reply for tests that only inspect the request."""
+    return Mock(id="resp_test", output_text="Test response")
 
-class TestConversationManager(unittest.TestCase):
+
+class TestConversationManager:
     """Test suite for ConversationManager class."""
     
-    def setUp(self):
-        """Set up test fixtures before each test method."""
-        # Mock the OpenAI client to avoid real API calls
-        with patch('conversation_manager.OpenAI'):
-            self.manager = ConversationManager(api_key="test_key")
-        
-        # Create a temporary directory for file operations
-        self.temp_dir = tempfile.mkdtemp()
-    
-    def tearDown(self):
-        """Clean up after each test method."""
-        # Remove temporary files
-        import shutil
-        if os.path.exists(self.temp_dir):
-            shutil.rmtree(self.temp_dir)
-    
-    def test_initialization_default_values(self):
+    def test_initialization_default_values(self, openai_mocks):
         """Test that ConversationManager initializes with correct defaults."""
-        with patch('conversation_manager.OpenAI'):
-            manager = ConversationManager()
+        manager = ConversationManager()
         
-        self.assertIsNone(manager.conversation_id)
-        self.assertEqual(manager.messages, [])
-        self.assertEqual(manager.model, "gpt-5")
-        self.assertEqual(manager.tools, [])
-        self.assertEqual(manager.metadata, {})
+        assert manager.conversation_id is None
+        assert manager.messages == []
+        assert manager.model == "gpt-5"
+        assert manager.tools == []
+        assert manager.metadata == {}
     
-    def test_create_conversation_default_model(self):
+    def test_create_conversation_default_model(self, manager):
         """Test creating a conversation with default GPT-5 model."""
-        conv_id = self.manager.create_conversation()
-        
-        self.assertIsNotNone(conv_id)
-        self.assertTrue(conv_id.startswith("conv_"))
-        self.assertEqual(self.manager.model, "gpt-5")
-        self.assertEqual(self.manager.messages, [])
-        self.assertIn('created_at', self.manager.metadata)
-        self.assertEqual(self.manager.metadata['model'], "gpt-5")
+        conv_id = manager.create_conversation()
+        
+        assert conv_id is not None
+        assert conv_id.startswith("conv_")
+        assert manager.model == "gpt-5"
+        assert manager.messages == []
+        assert 'created_at' in manager.metadata
+        assert manager.metadata['model'] == "gpt-5"
     
-    def test_create_conversation_custom_model(self):
+    def test_create_conversation_custom_model(self, manager):
         """Test creating a conversation with a custom model."""
-        conv_id = self.manager.create_conversation(model="gpt-4o")
+        conv_id = manager.create_conversation(model="gpt-4o")
         
-        self.assertEqual(self.manager.model, "gpt-4o")
-        self.assertEqual(self.manager.metadata['model'], "gpt-4o")
+        assert manager.model == "gpt-4o"
+        assert manager.metadata['model'] == "gpt-4o"
     
-    def test_create_conversation_with_tools(self):
+    def test_create_conversation_with_tools(self, manager):
         """Test creating a conversation with tools enabled."""
         tools = ["web_search", "file_search"]
-        conv_id = self.manager.create_conversation(tools=tools)
+        conv_id = manager.create_conversation(tools=tools)
         
-        self.assertEqual(self.manager.tools, tools)
+        assert manager.tools == tools
     
-    def test_create_conversation_with_metadata(self):
+    def test_create_conversation_with_metadata(self, manager):
         """Test creating a conversation with custom metadata."""
         metadata = {"project": "test_project", "user": "test_user"}
-        conv_id = self.manager.create_conversation(metadata=metadata)
+        conv_id = manager.create_conversation(metadata=metadata)
         
-        self.assertIn('project', self.manager.metadata)
-        self.assertEqual(self.manager.metadata['project'], "test_project")
+        assert 'project' in manager.metadata
+        assert manager.metadata['project'] == "test_project"
     
-    def test_set_model(self):
+    def test_set_model(self, manager):
         """Test changing the model after initialization."""
-        self.manager.create_conversation()
-        self.manager.set_model("gpt-4o-mini")
+        manager.create_conversation()
+        manager.set_model("gpt-4o-mini")
         
-        self.assertEqual(self.manager.model, "gpt-4o-mini")
-        self.assertEqual(self.manager.metadata['model'], "gpt-4o-mini")
+        assert manager.model == "gpt-4o-mini"
+        assert manager.metadata['model'] == "gpt-4o-mini"
     
-    def test_set_tools(self):
+    def test_set_tools(self, manager):
         """Test setting tools after initialization."""
-        self.manager.create_conversation()
+        manager.create_conversation()
         tools = ["code_interpreter"]
-        self.manager.set_tools(tools)
+        manager.set_tools(tools)
         
-        self.assertEqual(self.manager.tools, tools)
+        assert manager.tools == tools
     
-    def test_send_message_creates_conversation_if_none(self):
+    def test_send_message_creates_conversation_if_none(self, manager, mock_response):
         """Test that send_message creates a conversation if none exists."""
-        # Mock the API response
-        mock_response = Mock()
-        mock_response.choices = [Mock()]
-        mock_response.choices[0].message = Mock()
-        mock_response.choices[0].message.content = "Test response"
-        
-        self.manager.client.responses.create = Mock(return_value=mock_response)
+        manager.client.responses.create = Mock(return_value=mock_response)
         
         # Conversation ID should be None initially
-        self.assertIsNone(self.manager.conversation_id)
+        assert manager.conversation_id is None
         
         # Send a message (which should create a conversation)
-        result = self.manager.send_message("Hello")
+        result = manager.send_message("Hello")
         
         # Now conversation_id should be set
-        self.assertIsNotNone(self.manager.conversation_id)
+        assert manager.conversation_id is not None
+    
+    @pytest.mark.parametrize("create_kwargs, send_kwargs, expected, excluded", [
+        # Temperature is excluded for GPT-5
+        ({"model": "gpt-5"}, {"temperature": 0.7}, {}, ("temperature",)),
+        ({"model": "gpt-4o"}, {"temperature": 0.7}, {"temperature": 0.7}, ()),
+        # max_tokens is converted to max_output_tokens
+        ({}, {"max_tokens": 100}, {"max_output_tokens": 100}, ("max_tokens",)),
+        # Tools are converted to the API format
+        ({"tools": ["web_search", "file_search"]}, {},
+         {"tools": [{"type": "web_search"}, {"type": "file_search"}]}, ()),
+    ], ids=["gpt5_excludes_temperature", "gpt4o_includes_temperature",
+            "uses_max_output_tokens", "tools_format"])
+    def test_send_message_params(self, manager, mock_response, create_kwargs, send_kwargs, expected, excluded):
+        """Test that conversation settings are passed to the API in the proper format."""
+        manager.create_conversation(**create_kwargs)
+        manager.client.responses.create = Mock(return_value=mock_response)
+        
+        manager.send_message("Hello", **send_kwargs)
+        
+        # Check that the API was called, and get the arguments passed to it
+        manager.client.responses.create.assert_called_once()
+        params = manager.client.responses.create.call_args[1]
+        
+        for key, value in expected.items():
+            assert params[key] == value
+        for key in excluded:
+            assert key not in params
     
-    def test_send_message_gpt5_excludes_temperature(self):
-        """Test that temperature parameter is excluded for GPT-5."""
-        self.manager.create_conversation(model="gpt-5")
+    def test_send_message_async_uses_async_client(self, manager):
+        """Test that send_message_async awaits the AsyncOpenAI client."""
+        manager.create_conversation(model="gpt-4o")
         
-        # Mock the API call
         mock_response = Mock()
-        mock_response.choices = [Mock()]
-        mock_response.choices[0].message = Mock()
-        mock_response.choices[0].message.content = "Test response"
+        mock_response.output_text = "Async response"
         
-        self.manager.client.responses.create = Mock(return_value=mock_response)
+        manager.async_client.responses.create = AsyncMock(return_value=mock_response)
+        manager.client.responses.create = Mock()
         
-        # Send message with temperature
-        self.manager.send_message("Hello", temperature=0.7)
+        result = asyncio.run(manager.send_message_async("Hello", temperature=0.7))
         
-        # Check that the API was called
-        self.manager.client.responses.create.assert_called_once()
+        # Only the async client should be used
+        manager.async_client.responses.create.assert_awaited_once()
+        manager.client.responses.create.assert_not_called()
         
-        # Get the arguments passed to the API call
-        call_args = self.manager.client.responses.create.call_args
-        params = call_args[1] if call_args[1] else call_args[0][0] if call_args[0] else {}
+        params = manager.async_client.responses.create.call_args[1]
+        assert params["temperature"] == 0.7
         
-        # Temperature should not be in params for GPT-5
-        self.assertNotIn("temperature", params)
+        # Response is recorded in history like the sync path
+        assert result["success"]
+        assert result["content"] == "Async response"
+        assert manager.messages[-1]["content"] == "Async response"
     
-    def test_send_message_gpt4o_includes_temperature(self):
-        """Test that temperature parameter is included for GPT-4o."""
-        self.manager.create_conversation(model="gpt-4o")
+    def test_stream_message_async_yields_deltas(self, manager):
+        """Test that streaming yields coalesced text and records the full reply."""
+        manager.create_conversation()
         
-        # Mock the API call
-        mock_response = Mock()
-        mock_response.choices = [Mock()]
-        mock_response.choices[0].message = Mock()
-        mock_response.choices[0].message.content = "Test response"
+        events = [
+            Mock(type="response.created"),
+            Mock(type="response.output_text.delta", delta="Hel"),
+            Mock(type="response.output_text.delta", delta="lo"),
+            Mock(type="response.completed"),
+        ]
         
-        self.manager.client.responses.create = Mock(return_value=mock_response)
+        async def event_stream():
+            for event in events:
+                yield event
         
-        # Send message with temperature
-        self.manager.send_message("Hello", temperature=0.7)
+        manager.async_client.responses.create = AsyncMock(return_value=event_stream())
         
-        # Check that the API was called
-        self.manager.client.responses.create.assert_called_once()
+        async def collect():
+            return [delta async for delta in manager.stream_message_async("Hi")]
         
-        # Get the arguments passed to the API call
-        call_args = self.manager.client.responses.create.call_args
-        params = call_args[1] if call_args[1] else {}
+        deltas = asyncio.run(collect())
         
-        # Temperature should be in params for GPT-4o
-        self.assertIn("temperature", params)
-        self.assertEqual(params["temperature"], 0.7)
+        # Small deltas arriving together are released as one chunk
+        assert deltas == ["Hello"]
+        assert manager.async_client.responses.create.call_args[1]["stream"]
+        assert manager.messages[-1]["role"] == "assistant"
+        assert manager.messages[-1]["content"] == "Hello"
+    
+    def test_stream_text_yields_strings(self, manager):
+        """Test that stream_text yields bare strings and records the full reply."""
+        manager.create_conversation()
+        
+        events = [
+            ResponseTextDeltaEvent(
+                type="response.output_text.delta", delta=text, content_index=0,
+                item_id="msg_test", output_index=0, sequence_number=i, logprobs=[]
+            )
+            for i, text in enumerate(("Hi", " there"))
+        ]
+        events.append(ResponseCompletedEvent.model_construct(
+            type="response.completed", response=Response.model_construct(id="resp_stream"), sequence_number=2
+        ))
+        manager.client.responses.create = Mock(return_value=iter(events))
+        
+        texts = list(manager.stream_text("Hello"))
+        
+        assert texts == ["Hi there"]
+        assert manager.client.responses.create.call_args[1]["stream"]
+        assert manager.messages[-1]["role"] == "assistant"
+        assert manager.messages[-1]["content"] == "Hi there"
+        assert manager.last_response_id == "resp_stream"
     
-    def test_send_message_uses_max_output_tokens(self):
-        """Test that max_tokens is converted to max_output_tokens."""
-        self.manager.create_conversation()
+    def test_send_message_async_stream_yields_chunks(self, manager):
+        """Test that async streaming yields chunk dicts like the sync path."""
+        manager.create_conversation()
         
-        # Mock the API call
-        mock_response = Mock()
-        mock_response.choices = [Mock()]
-        mock_response.choices[0].message = Mock()
-        mock_response.choices[0].message.content = "Test response"
+        async def event_stream():
+            yield Mock(type="response.output_text.delta", delta="Hi")
+            yield Mock(type="response.output_text.delta", delta=" there")
         
-        self.manager.client.responses.create = Mock(return_value=mock_response)
+        manager.async_client.responses.create = AsyncMock(return_value=event_stream())
         
-        # Send message with max_tokens
-        self.manager.send_message("Hello", max_tokens=100)
+        async def collect():
+            chunks = await manager.send_message_async("Hello", stream=True)
+            return [chunk async for chunk in chunks]
         
-        # Get the arguments passed to the API call
-        call_args = self.manager.client.responses.create.call_args
-        params = call_args[1] if call_args[1] else {}
+        chunks = asyncio.run(collect())
         
-        # Should use max_output_tokens
-        self.assertIn("max_output_tokens", params)
-        self.assertEqual(params["max_output_tokens"], 100)
+        assert [c["content"] for c in chunks if c.get("is_chunk")] == ["Hi there"]
+        assert chunks[-1]["is_complete"]
+        assert chunks[-1]["content"] == "Hi there"
+        assert chunks[-1]["message_count"] == 2
     
-    def test_send_message_tools_format(self):
-        """Test that tools are converted to proper format."""
-        self.manager.create_conversation(tools=["web_search", "file_search"])
+    def test_send_messages_batch_keeps_order_and_history(self, manager):
+        """Test that batched prompts return results in order without touching history."""
+        manager.create_conversation(model="gpt-4o")
         
-        # Mock the API call
-        mock_response = Mock()
-        mock_response.choices = [Mock()]
-        mock_response.choices[0].message = Mock()
-        mock_response.choices[0].message.content = "Test response"
+        async def create(**params):
+            if params["input"] == "bad":
+                raise OpenAIError("boom")
+            return Mock(output_text=params["input"].upper())
         
-        self.manager.client.responses.create = Mock(return_value=mock_response)
+        manager.async_client.responses.create = AsyncMock(side_effect=create)
         
-        # Send message
-        self.manager.send_message("Hello")
+        results = asyncio.run(manager.send_messages_batch(["a", "bad", "c"], concurrency=2))
         
-        # Get the arguments passed to the API call
-        call_args = self.manager.client.responses.create.call_args
-        params = call_args[1] if call_args[1] else {}
+        assert [r["success"] for r in results] == [True, False, True]
+        assert results[0]["content"] == "A"
+        assert results[2]["content"] == "C"
+        assert manager.messages == []
+    
+    def test_send_message_continues_from_previous_response(self, manager):
+        """Test that follow-ups pass previous_response_id instead of resending history."""
+        manager.create_conversation(model="gpt-4o")
+        
+        first = Mock(id="resp_1", output_text="Hi there")
+        second = Mock(id="resp_2", output_text="Fine")
+        manager.client.responses.create = Mock(side_effect=[first, second])
+        
+        manager.send_message("Hello")
+        manager.send_message("How are you?")
+        
+        first_params = manager.client.responses.create.call_args_list[0][1]
+        second_params = manager.client.responses.create.call_args_list[1][1]
+        assert "previous_response_id" not in first_params
+        assert second_params["previous_response_id"] == "resp_1"
+        assert second_params["input"] == "How are you?"
+        assert manager.last_response_id == "resp_2"
+        assert manager.messages[-1]["response_id"] == "resp_2"
+    
+    def test_send_message_without_response_id_falls_back_to_context(self, manager):
+        """Test that history is sent as context when there is no response to continue."""
+        manager.create_conversation(model="gpt-4o")
+        manager.messages = [
+            {"role": "user", "content": "Hello"},
+            {"role": "assistant", "content": "Hi there"},
+        ]
+        assert manager.restore_response_id() is None
+        
+        mock_response = Mock(id="resp_3", output_text="Fine")
+        manager.client.responses.create = Mock(return_value=mock_response)
+        
+        manager.send_message("How are you?")
+        
+        params = manager.client.responses.create.call_args[1]
+        assert "previous_response_id" not in params
+        assert "assistant: Hi there" in params["input"]
+    
+    def test_send_message_summarizes_long_context(self, manager):
+        """Test that older history is folded into a summary when sent as context."""
+        manager.create_conversation(model="gpt-4o")
+        manager.messages = [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i}"}
+            for i in range(26)
+        ]
+        
+        summary = Mock(id="resp_s", output_text="Earlier summary")
+        reply = Mock(id="resp_4", output_text="Fine")
+        manager.client.responses.create = Mock(side_effect=[summary, reply])
+        
+        manager.send_message("How are you?")
+        
+        summary_params = manager.client.responses.create.call_args_list[0][1]
+        assert summary_params["model"] == manager.summary_model
+        assert "message 19" in summary_params["input"]
+        assert "message 20" not in summary_params["input"]
+        
+        params = manager.client.responses.create.call_args_list[1][1]
+        assert "Earlier summary" in params["input"]
+        assert "assistant: message 25" in params["input"]
+        assert "message 19" not in params["input"]
+    
+    def test_send_message_reuses_semantic_cache_hit(self, manager):
+        """Test that a cached reply skips the Responses API."""
+        cache = Mock()
+        cache.lookup.return_value = "Cached reply"
+        manager.semantic_cache = cache
+        manager.create_conversation(model="gpt-4o")
+        
+        embedding = Mock()
+        embedding.data = [Mock(embedding=[0.1, 0.2])]
+        manager.client.embeddings.create = Mock(return_value=embedding)
+        manager.client.responses.create = Mock()
+        
+        result = manager.send_message("Hello")
+        
+        manager.client.responses.create.assert_not_called()
+        cache.lookup.assert_called_once_with([0.1, 0.2], "gpt-4o:")
+        assert result["cached"]
+        assert [m["content"] for m in manager.messages] == ["Hello", "Cached reply"]
+        # The server never saw the cached turn, so there is nothing to chain from
+        assert manager.last_response_id is None
+    
+    def test_send_message_caches_reply_on_miss(self, manager):
+        """Test that a fresh reply is added to the semantic cache."""
+        cache = Mock()
+        cache.lookup.return_value = None
+        manager.semantic_cache = cache
+        manager.create_conversation(model="gpt-4o")
+        
+        embedding = Mock()
+        embedding.data = [Mock(embedding=[0.1, 0.2])]
+        manager.client.embeddings.create = Mock(return_value=embedding)
+        manager.client.responses.create = Mock(return_value=Mock(id="resp_1", output_text="Fresh"))
+        
+        manager.send_message("Hello")
         
-        # Tools should be in proper format
-        self.assertIn("tools", params)
-        expected_tools = [{"type": "web_search"}, {"type": "file_search"}]
-        self.assertEqual(params["tools"], expected_tools)
+        cache.add.assert_called_once_with([0.1, 0.2], "Fresh", "gpt-4o:")
+    
+    def test_send_message_async_saves_cache_off_event_loop(self, manager):
+        """Test that a due cache save runs in a worker thread, not on the event loop."""
+        cache = Mock()
+        cache.lookup.return_value = None
+        cache.save_due.return_value = True
+        manager.semantic_cache = cache
+        manager.create_conversation(model="gpt-4o")
+        
+        embedding = Mock()
+        embedding.data = [Mock(embedding=[0.1, 0.2])]
+        manager.async_client.embeddings.create = AsyncMock(return_value=embedding)
+        manager.async_client.responses.create = AsyncMock(return_value=Mock(id="resp_1", output_text="Fresh"))
+        
+        with patch('conversation_manager.asyncio.to_thread', new=AsyncMock()) as to_thread:
+            asyncio.run(manager.send_message_async("Hello"))
+        
+        cache.add.assert_called_once_with([0.1, 0.2], "Fresh", "gpt-4o:")
+        to_thread.assert_awaited_once_with(cache.flush)
+        cache.flush.assert_not_called()
+    
+    def test_extract_content_reuses_accessor_per_type(self, manager):
+        """Test that extraction remembers the accessor and falls back when it fails."""
+        class Text:
+            def __init__(self, text):
+                self.text = text
+        
+        class Message:
+            def __init__(self, text):
+                self.content = [Text(text)]
+        
+        class Response:
+            def __init__(self, text):
+                self.output = [Message(text)]
+        
+        assert manager._extract_content(Response("first")) == "first"
+        assert Response in manager._extractors
+        assert manager._extract_content(Response("second")) == "second"
+        
+        # A response of the same type with a different shape is probed again
+        odd = Response("unused")
+        odd.output = ["plain message"]
+        assert manager._extract_content(odd) == "plain message"
+    
+    def test_stream_buffer_releases_on_size_and_newline(self):
+        """Test that the stream buffer holds text until a flush condition is met."""
+        buffer = StreamBuffer(max_chars=5, max_ms=60_000)
+        
+        assert buffer.push("ab") is None
+        assert buffer.push("cde") == "abcde"
+        assert buffer.push("x\n") == "x\n"
+        assert buffer.push("y") is None
+        assert buffer.flush() == "y"
+        assert buffer.flush() == ""
     
-    def test_get_history(self):
+    def test_stream_buffer_releases_after_max_ms(self):
+        """Test that a zero time window releases every push."""
+        buffer = StreamBuffer(max_chars=1000, max_ms=0, flush_on_newline=False)
+        
+        assert buffer.push("a") == "a"
+        assert buffer.push("b\n") == "b\n"
+    
+    def test_get_history(self, manager):
         """Test getting conversation history."""
-        self.manager.create_conversation()
+        manager.create_conversation()
         
         # Add some messages manually
-        self.manager.messages.append({"role": "user", "content": "Hello"})
-        self.manager.messages.append({"role": "assistant", "content": "Hi there"})
+        manager.messages.append({"role": "user", "content": "Hello"})
+        manager.messages.append({"role": "assistant", "content": "Hi there"})
+        
+        history = manager.get_history()
         
-        history = self.manager.get_history()
+        assert len(history) == 2
+        assert history[0]["content"] == "Hello"
+        assert history[1]["content"] == "Hi there"
         
-        self.assertEqual(len(history), 2)
-        self.assertEqual(history[0]["content"], "Hello")
-        self.assertEqual(history[1]["content"], "Hi there")
+        # By default the live list is returned without copying
+        assert history is manager.messages
         
-        # Verify it returns a copy of the list (but shallow copy of dicts)
+        # copy=True returns a copy of the list (but shallow copy of dicts)
         # Modifying the list should not affect original
+        history = manager.get_history(copy=True)
         history.append({"role": "user", "content": "New"})
-        self.assertEqual(len(self.manager.messages), 2)  # Original unchanged
+        assert len(manager.messages) == 2  # Original unchanged
     
-    def test_clear_history(self):
+    def test_clear_history(self, manager):
         """Test clearing conversation history."""
-        self.manager.create_conversation()
+        manager.create_conversation()
         
         # Add some messages
-        self.manager.messages.append({"role": "user", "content": "Hello"})
-        self.manager.messages.append({"role": "assistant", "content": "Hi"})
+        manager.messages.append({"role": "user", "content": "Hello"})
+        manager.messages.append({"role": "assistant", "content": "Hi"})
         
-        conv_id = self.manager.conversation_id
+        conv_id = manager.conversation_id
         
         # Clear history
-        self.manager.clear_history()
+        manager.clear_history()
         
         # Messages should be empty but conversation_id should remain
-        self.assertEqual(len(self.manager.messages), 0)
-        self.assertEqual(self.manager.conversation_id, conv_id)
+        assert len(manager.messages) == 0
+        assert manager.conversation_id == conv_id
     
-    def test_get_message_count(self):
+    def test_get_message_count(self, manager):
         """Test getting message count."""
-        self.manager.create_conversation()
+        manager.create_conversation()
         
-        self.assertEqual(self.manager.get_message_count(), 0)
+        assert manager.get_message_count() == 0
         
-        self.manager.messages.append({"role": "user", "content": "Hello"})
-        self.assertEqual(self.manager.get_message_count(), 1)
+        manager.messages.append({"role": "user", "content": "Hello"})
+        assert manager.get_message_count() == 1
         
-        self.manager.messages.append({"role": "assistant", "content": "Hi"})
-        self.assertEqual(self.manager.get_message_count(), 2)
+        manager.messages.append({"role": "assistant", "content": "Hi"})
+        assert manager.get_message_count() == 2
     
-    def test_get_last_message(self):
+    def test_get_last_message(self, manager):
         """Test getting the last message."""
-        self.manager.create_conversation()
+        manager.create_conversation()
         
         # No messages yet
-        self.assertIsNone(self.manager.get_last_message())
+        assert manager.get_last_message() is None
         
         # Add a message
-        self.manager.messages.append({"role": "user", "content": "First"})
-        self.assertEqual(self.manager.get_last_message()["content"], "First")
+        manager.messages.append({"role": "user", "content": "First"})
+        assert manager.get_last_message()["content"] == "First"
         
         # Add another message
-        self.manager.messages.append({"role": "assistant", "content": "Second"})
-        self.assertEqual(self.manager.get_last_message()["content"], "Second")
+        manager.messages.append({"role": "assistant", "content": "Second"})
+        assert manager.get_last_message()["content"] == "Second"
     
-    def test_save_conversation(self):
+    def test_save_conversation(self, manager, tmp_path):
         """Test saving conversation to a file."""
-        self.manager.create_conversation(model="gpt-5", tools=["web_search"])
-        self.manager.messages.append({"role": "user", "content": "Hello"})
+        manager.create_conversation(model="gpt-5", tools=["web_search"])
+        manager.messages.append({"role": "user", "content": "Hello"})
         
-        filepath = os.path.join(self.temp_dir, "test_conversation.json")
-        self.manager.save_conversation(filepath)
+        filepath = str(tmp_path / "test_conversation.json")
+        manager.save_conversation(filepath)
         
         # Verify file exists
-        self.assertTrue(os.path.exists(filepath))
+        assert os.path.exists(filepath)
         
         # Verify file content
         with open(filepath, 'r') as f:
             data = json.load(f)
         
-        self.assertEqual(data["model"], "gpt-5")
-        self.assertEqual(data["tools"], ["web_search"])
-        self.assertEqual(len(data["messages"]), 1)
-        self.assertEqual(data["messages"][0]["content"], "Hello")
+        assert data["model"] == "gpt-5"
+        assert data["tools"] == ["web_search"]
+        assert len(data["messages"]) == 1
+        assert data["messages"][0]["content"] == "Hello"
+    
+    def test_append_message_to_file(self, tmp_path):
+        """Test that messages are appended to a JSONL log one per line."""
+        filepath = str(tmp_path / "test_log.jsonl")
+        ConversationManager.append_message_to_file(filepath, {"role": "user", "content": "Hello"})
+        ConversationManager.append_message_to_file(filepath, {"role": "assistant", "content": "Hi"})
+        
+        with open(filepath, 'r') as f:
+            messages = [json.loads(line) for line in f]
+        
+        assert [m["content"] for m in messages] == ["Hello", "Hi"]
     
-    def test_load_conversation(self):
+    def test_load_conversation(self, manager, tmp_path):
         """Test loading conversation from a file."""
         # Create test data
         test_data = {
@@ -314,59 +534,74 @@ class TestConversationManager(unittest.TestCase):
             ]
         }
         
-        filepath = os.path.join(self.temp_dir, "test_load.json")
+        filepath = str(tmp_path / "test_load.json")
         with open(filepath, 'w') as f:
             json.dump(test_data, f)
         
         # Load the conversation
-        self.manager.load_conversation(filepath)
+        manager.load_conversation(filepath)
         
         # Verify loaded data
-        self.assertEqual(self.manager.conversation_id, "test_conv_123")
-        self.assertEqual(self.manager.model, "gpt-4o")
-        self.assertEqual(self.manager.tools, ["file_search"])
-        self.assertEqual(self.manager.metadata["test"], "value")
-        self.assertEqual(len(self.manager.messages), 1)
-        self.assertEqual(self.manager.messages[0]["content"], "Test message")
-    
-    def test_load_conversation_defaults_to_gpt5(self):
+        assert manager.conversation_id == "test_conv_123"
+        assert manager.model == "gpt-4o"
+        assert manager.tools == ["file_search"]
+        assert manager.metadata["test"] == "value"
+        assert len(manager.messages) == 1
+        assert manager.messages[0]["content"] == "Test message"
+    
+    def test_load_conversation_defaults_to_gpt5(self, manager, tmp_path):
         """Test that loading a conversation without model defaults to GPT-5."""
         test_data = {
             "conversation_id": "test_conv_456",
             "messages": []
         }
         
-        filepath = os.path.join(self.temp_dir, "test_default.json")
+        filepath = str(tmp_path / "test_default.json")
         with open(filepath, 'w') as f:
             json.dump(test_data, f)
         
-        self.manager.load_conversation(filepath)
+        manager.load_conversation(filepath)
         
         # Should default to gpt-5
-        self.assertEqual(self.manager.model, "gpt-5")
+        assert manager.model == "gpt-5"
     
-    def test_build_context(self):
+    def test_build_context(self, manager):
         """Test building context from conversation history."""
-        self.manager.create_conversation()
+        manager.create_conversation()
         
         # Add messages
-        self.manager.messages.append({"role": "user", "content": "Hello"})
-        self.manager.messages.append({"role": "assistant", "content": "Hi there"})
-        self.manager.messages.append({"role": "user", "content": "How are you?"})
+        manager.messages.append({"role": "user", "content": "Hello"})
+        manager.messages.append({"role": "assistant", "content": "Hi there"})
+        manager.messages.append({"role": "user", "content": "How are you?"})
         
-        context = self.manager._build_context()
+        context = manager._build_context()
         
-        self.assertIsNotNone(context)
-        self.assertIn("user: Hello", context)
-        self.assertIn("assistant: Hi there", context)
+        assert context is not None
+        assert "user: Hello" in context
+        assert "assistant: Hi there" in context
         # The last message should not be in context (it's excluded)
-        self.assertNotIn("How are you?", context)
+        assert "How are you?" not in context
 
+    
+    def test_build_context_extends_cached_prefix(self, manager):
+        """Test that context built incrementally matches a full rebuild."""
+        manager.create_conversation()
+        manager.messages.append({"role": "user", "content": "Hello"})
+        manager.messages.append({"role": "assistant", "content": "Hi there"})
+        manager.messages.append({"role": "user", "content": "How are you?"})
+        manager._build_context()
+        
+        manager.messages.append({"role": "assistant", "content": "Fine"})
+        manager.messages.append({"role": "user", "content": "Great"})
+        context = manager._build_context()
+        
+        assert context == "user: Hello\nassistant: Hi there\nuser: How are you?\nassistant: Fine"
 
-class TestConversationManagerIntegration(unittest.TestCase):
-    """Integration tests that may require API access (optional)."""
+@pytest.mark.integration
+class TestConversationManagerIntegration:
+    """Integration tests that may require API access (optional, run with ``-m integration``)."""
     
-    @unittest.skipUnless(os.getenv("OPENAI_API_KEY"), "Requires OPENAI_API_KEY")
+    @pytest.mark.skipif(not os.getenv("OPENAI_API_KEY"), reason="Requires OPENAI_API_KEY")
     def test_real_api_call(self):
         """Test a real API call (requires valid API key)."""
         manager = ConversationManager()
@@ -374,28 +609,11 @@ class TestConversationManagerIntegration(unittest.TestCase):
         
         try:
             response = manager.send_message("Say 'test successful' and nothing else.")
-            self.assertTrue(response.get("success", False))
-            self.assertIsNotNone(response.get("content"))
+            assert response.get("success", False)
+            assert response.get("content") is not None
             print(f"\nReal API Response: {response.get('content')}")
         except Exception as e:
-            self.skipTest(f"API call failed: {e}")
-
-
-def run_tests(verbose=True):
-    """Run all tests."""
-    # Create test suite
-    loader = unittest.TestLoader()
-    suite = unittest.TestSuite()
-    
-    # Add all test cases
-    suite.addTests(loader.loadTestsFromTestCase(TestConversationManager))
-    suite.addTests(loader.loadTestsFromTestCase(TestConversationManagerIntegration))
-    
-    # Run tests
-    runner = unittest.TextTestRunner(verbosity=2 if verbose else 1)
-    result = runner.run(suite)
-    
-    return result
+            pytest.skip(f"API call failed: {e}")
 
 
 if __name__ == "__main__":
@@ -403,18 +621,4 @@ if __name__ == "__main__":
     print("Testing ConversationManager")
     print("=" * 70)
     
-    # Run tests
-    result = run_tests(verbose=True)
-    
-    # Print summary
-    print("\n" + "=" * 70)
-    print("Test Summary")
-    print("=" * 70)
-    print(f"Tests run: {result.testsRun}")
-    print(f"Successes: {result.testsRun - len(result.failures) - len(result.errors)}")
-    print(f"Failures: {len(result.failures)}")
-    print(f"Errors: {len(result.errors)}")
-    print(f"Skipped: {len(result.skipped)}")
-    
-    # Exit with appropriate code
-    sys.exit(0 if result.wasSuccessful() else 1)
+    sys.exit(pytest.main([__file__, "-v"]))
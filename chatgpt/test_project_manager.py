@@ -0,0 +1,222 @@
+"""
+Test script for ProjectManager.
+
+This script tests saving conversations to projects, including:
+- Full saves followed by appended messages
+- Loading conversations saved with inline messages
+- Rewriting a conversation's message log
+- Deleting a conversation's files
+- Listing projects found by scanning the projects directory
+"""
+import os
+import sys
+import json
+from unittest.mock import patch
+
+import pytest
+
+# Add parent directory to path if running directly
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from project_manager import ProjectManager
+
+
+def _message(role, content):
+    """A chat message as stored in a conversation."""
+    return {"role": role, "content": content}
+
+
+@pytest.fixture
+def manager(tmp_path):
+    """A ProjectManager storing its data in a temporary directory."""
+    return ProjectManager(data_dir=str(tmp_path))
+
+
+@pytest.fixture
+def project_id(manager):
+    """A project holding one empty conversation, conv_1."""
+    project_id = manager.create_project("Test Project")
+    manager.add_conversation(project_id, "conv_1", title="First")
+    return project_id
+
+
+class TestConversationStorage:
+    """Test suite for saving and loading conversations in a project."""
+    
+    def test_save_then_append(self, manager, project_id):
+        """Test that appended messages load after the fully saved ones."""
+        manager.save_conversation_to_project(project_id, "conv_1", {
+            "conversation_id": "conv_1",
+            "model": "gpt-5",
+            "messages": [_message("user", "Hello"), _message("assistant", "Hi")]
+        })
+        
+        assert manager.append_messages(project_id, "conv_1", [_message("user", "How are you?")])
+        assert manager.append_messages(project_id, "conv_1", [_message("assistant", "Fine")])
+        
+        loaded = manager.load_conversation_from_project(project_id, "conv_1")
+        assert loaded["model"] == "gpt-5"
+        assert [m["content"] for m in loaded["messages"]] == ["Hello", "Hi", "How are you?", "Fine"]
+    
+    def test_metadata_file_has_no_messages(self, manager, project_id):
+        """Test that messages are written to the log rather than the metadata file."""
+        manager.save_conversation_to_project(project_id, "conv_1", {
+            "model": "gpt-5",
+            "messages": [_message("user", "Hello")]
+        })
+        
+        project_dir = manager.projects_dir / project_id
+        with open(project_dir / "conv_1.json") as f:
+            assert "messages" not in json.load(f)
+        with open(project_dir / "conv_1.jsonl") as f:
+            assert [json.loads(line) for line in f] == [_message("user", "Hello")]
+    
+    def test_load_legacy_inline_messages(self, manager, project_id):
+        """Test loading a conversation saved as a single file with inline messages."""
+        with open(manager.projects_dir / project_id / "conv_1.json", "w") as f:
+            json.dump({"model": "gpt-4o", "messages": [_message("user", "Old")]}, f)
+        
+        loaded = manager.load_conversation_from_project(project_id, "conv_1")
+        assert loaded["model"] == "gpt-4o"
+        assert loaded["messages"] == [_message("user", "Old")]
+        
+        # Messages appended later follow the inline ones
+        manager.append_messages(project_id, "conv_1", [_message("assistant", "New")])
+        loaded = manager.load_conversation_from_project(project_id, "conv_1")
+        assert [m["content"] for m in loaded["messages"]] == ["Old", "New"]
+    
+    def test_full_save_rewrites_log(self, manager, project_id):
+        """Test that a full save after clearing the chat replaces the earlier messages."""
+        manager.save_conversation_to_project(project_id, "conv_1", {
+            "messages": [_message("user", "Hello"), _message("assistant", "Hi")]
+        })
+        manager.append_messages(project_id, "conv_1", [_message("user", "More")])
+        
+        # clear_chat resets the saved length, so the next save is a full one
+        manager.save_conversation_to_project(project_id, "conv_1", {
+            "messages": [_message("user", "Fresh start")]
+        })
+        
+        loaded = manager.load_conversation_from_project(project_id, "conv_1")
+        assert loaded["messages"] == [_message("user", "Fresh start")]
+    
+    def test_full_save_replaces_legacy_messages(self, manager, project_id):
+        """Test that a full save drops messages stored inline by an older save."""
+        with open(manager.projects_dir / project_id / "conv_1.json", "w") as f:
+            json.dump({"messages": [_message("user", "Old")]}, f)
+        
+        manager.save_conversation_to_project(project_id, "conv_1", {
+            "messages": [_message("user", "New")]
+        })
+        
+        loaded = manager.load_conversation_from_project(project_id, "conv_1")
+        assert loaded["messages"] == [_message("user", "New")]
+    
+    def test_remove_deletes_both_files(self, manager, project_id):
+        """Test that removing a conversation deletes its metadata and message log."""
+        manager.save_conversation_to_project(project_id, "conv_1", {
+            "messages": [_message("user", "Hello")]
+        })
+        project_dir = manager.projects_dir / project_id
+        assert (project_dir / "conv_1.json").exists()
+        assert (project_dir / "conv_1.jsonl").exists()
+        
+        assert manager.remove_conversation(project_id, "conv_1")
+        
+        assert not (project_dir / "conv_1.json").exists()
+        assert not (project_dir / "conv_1.jsonl").exists()
+        assert manager.load_conversation_from_project(project_id, "conv_1") is None
+        assert manager.list_conversations(project_id) == []
+    
+    def test_missing_conversation(self, manager, project_id):
+        """Test that loading an unsaved conversation returns None."""
+        assert manager.load_conversation_from_project(project_id, "conv_1") is None
+        assert not manager.append_messages("missing_project", "conv_1", [_message("user", "Hi")])
+
+
+class TestProjectListing:
+    """Test suite for listing projects from the projects directory."""
+    
+    def test_lists_project_directories(self, manager):
+        """Test that every project directory is listed, newest first."""
+        first = manager.create_project("First")
+        second = manager.create_project("Second", description="Another")
+        
+        projects = manager.list_projects()
+        assert {p["id"] for p in projects} == {first, second}
+        assert projects[0]["created_at"] >= projects[1]["created_at"]
+        assert next(p for p in projects if p["id"] == second)["description"] == "Another"
+    
+    def test_skips_entries_without_project_file(self, manager):
+        """Test that stray files and directories without project.json are ignored."""
+        project_id = manager.create_project("Real")
+        (manager.projects_dir / "empty_dir").mkdir()
+        (manager.projects_dir / "stray.txt").write_text("not a project")
+        
+        assert [p["id"] for p in manager.list_projects()] == [project_id]
+    
+    def test_unchanged_projects_are_not_reparsed(self, manager):
+        """Test that a second listing reuses the summaries of unchanged files."""
+        manager.create_project("First")
+        manager.create_project("Second")
+        manager.list_projects()
+        
+        with patch.object(manager, "_load_project_raw", wraps=manager._load_project_raw) as load:
+            manager.list_projects()
+        load.assert_not_called()
+    
+    def test_changed_project_file_is_reparsed(self, manager):
+        """Test that a project.json rewritten by another process is listed anew."""
+        project_id = manager.create_project("Old name")
+        manager.list_projects()
+        
+        project_file = manager.projects_dir / project_id / "project.json"
+        with open(project_file) as f:
+            project = json.load(f)
+        project["name"] = "New name"
+        with open(project_file, "w") as f:
+            json.dump(project, f)
+        # Make sure the mtime changes even on filesystems with coarse timestamps
+        stat = os.stat(project_file)
+        os.utime(project_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        
+        assert [p["name"] for p in manager.list_projects()] == ["New name"]
+        assert manager.get_project(project_id)["name"] == "New name"
+    
+    def test_sees_projects_of_other_managers(self, manager, tmp_path):
+        """Test that projects created or deleted through another manager show up."""
+        manager.list_projects()
+        other = ProjectManager(data_dir=str(tmp_path))
+        
+        project_id = other.create_project("From elsewhere")
+        assert [p["id"] for p in manager.list_projects()] == [project_id]
+        
+        other.delete_project(project_id)
+        assert manager.list_projects() == []
+    
+    def test_conversation_count_follows_changes(self, manager):
+        """Test that the listed conversation count is updated by this manager's writes."""
+        project_id = manager.create_project("Counted")
+        assert manager.list_projects()[0]["conversation_count"] == 0
+        
+        manager.add_conversation(project_id, "conv_1")
+        manager.add_conversation(project_id, "conv_2")
+        assert manager.list_projects()[0]["conversation_count"] == 2
+        
+        manager.remove_conversation(project_id, "conv_1")
+        assert manager.list_projects()[0]["conversation_count"] == 1
+    
+    def test_list_conversations_follows_saves(self, manager):
+        """Test that the cached conversation listing is invalidated by saves."""
+        project_id = manager.create_project("Ordered")
+        manager.add_conversation(project_id, "conv_1", title="First")
+        manager.add_conversation(project_id, "conv_2", title="Second")
+        manager.list_conversations(project_id)
+        
+        manager.append_messages(project_id, "conv_1", [_message("user", "Bump")])
+        
+        assert [c["id"] for c in manager.list_conversations(project_id)] == ["conv_1", "conv_2"]
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
@@ -5,8 +5,11 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+import pytest
+
 from conversation_manager import ConversationManager
 
+@pytest.mark.integration
 def test_response_extraction():
     """Test that we can extract content from actual API responses."""
     print("Testing response extraction...")
@@ -0,0 +1,110 @@
+"""
+Test script for SemanticCache.
+
+This script tests lookup thresholds, context partitioning and
+saving/loading the cache.
+"""
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+# Add parent directory to path if running directly
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from semantic_cache import SemanticCache
+
+
+class TestSemanticCache(unittest.TestCase):
+    """Test suite for SemanticCache class."""
+    
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.cache = SemanticCache(dim=4, threshold=0.9)
+        self.temp_dir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        """Clean up after each test method."""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_lookup_empty_cache_misses(self):
+        """Test that an empty cache never hits."""
+        self.assertIsNone(self.cache.lookup([1, 0, 0, 0]))
+    
+    def test_lookup_hits_similar_vector(self):
+        """Test that a close, unnormalized vector returns the cached reply."""
+        self.cache.add([1, 0, 0, 0], "cached")
+        self.assertEqual(self.cache.lookup([2, 0.1, 0, 0]), "cached")
+    
+    def test_lookup_misses_below_threshold(self):
+        """Test that dissimilar vectors miss."""
+        self.cache.add([1, 0, 0, 0], "cached")
+        self.assertIsNone(self.cache.lookup([1, 1, 0, 0]))
+    
+    def test_lookup_returns_best_match(self):
+        """Test that the most similar entry wins."""
+        self.cache.add([1, 0.3, 0, 0], "near")
+        self.cache.add([1, 0.01, 0, 0], "nearest")
+        self.assertEqual(self.cache.lookup([1, 0, 0, 0]), "nearest")
+    
+    def test_lookup_respects_context(self):
+        """Test that replies are only reused within the same context."""
+        self.cache.add([1, 0, 0, 0], "first", context="a")
+        self.cache.add([1, 0, 0, 0], "second", context="b")
+        self.assertEqual(self.cache.lookup([1, 0, 0, 0], context="a"), "first")
+        self.assertEqual(self.cache.lookup([1, 0, 0, 0], context="b"), "second")
+        self.assertIsNone(self.cache.lookup([1, 0, 0, 0], context="c"))
+    
+    def test_add_grows_past_initial_capacity(self):
+        """Test that many entries can be added."""
+        for i in range(40):
+            vector = np.zeros(4)
+            vector[i % 4] = 1
+            self.cache.add(vector, f"reply {i}", context=str(i))
+        self.assertEqual(len(self.cache), 40)
+        self.assertEqual(self.cache.lookup([0, 1, 0, 0], context="37"), "reply 37")
+    
+    def test_rejects_wrong_dimension(self):
+        """Test that embeddings of the wrong size are rejected."""
+        with self.assertRaises(ValueError):
+            self.cache.add([1, 0, 0], "cached")
+    
+    def test_save_and_load(self):
+        """Test that a cache with a path persists across instances."""
+        path = os.path.join(self.temp_dir, "cache.npz")
+        cache = SemanticCache(dim=4, threshold=0.9, path=path)
+        cache.add([0, 0, 1, 0], "persisted", context="ctx")
+        cache.flush()
+        
+        reloaded = SemanticCache(dim=4, threshold=0.9, path=path)
+        self.assertEqual(len(reloaded), 1)
+        self.assertEqual(reloaded.lookup([0, 0, 1, 0], context="ctx"), "persisted")
+
+    
+    def test_saves_are_batched(self):
+        """Test that adds only make a save due every save_every entries."""
+        path = os.path.join(self.temp_dir, "cache.npz")
+        cache = SemanticCache(dim=4, threshold=0.9, path=path, save_every=2)
+        cache.add([1, 0, 0, 0], "first")
+        self.assertFalse(cache.save_due())
+        self.assertFalse(os.path.exists(path))
+        
+        cache.add([0, 1, 0, 0], "second")
+        self.assertTrue(cache.save_due())
+        cache.flush()
+        self.assertFalse(cache.save_due())
+        self.assertEqual(len(SemanticCache(dim=4, threshold=0.9, path=path)), 2)
+    
+    def test_flush_without_path_is_noop(self):
+        """Test that an in-memory cache never becomes due or writes."""
+        self.cache.add([1, 0, 0, 0], "cached")
+        self.assertFalse(self.cache.save_due())
+        self.cache.flush()
+        self.assertEqual(os.listdir(self.temp_dir), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
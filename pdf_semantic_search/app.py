@@ -1,16 +1,23 @@
 from flask import Flask, request, render_template, redirect, url_for, g
+import functools
 import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import logging
 
 from werkzeug.utils import secure_filename
-import pandas as pd
+import numpy as np
 from transformers import AutoTokenizer, AutoModel
-from datasets import load_from_disk, concatenate_datasets, Dataset
+from datasets import load_from_disk, Dataset
+import faiss
 import torch
 import torch.nn.functional as F
 from utils.pdf_reader import extract_information
 from utils.embedding_generator import compute_embeddings, generate_embeddings_for_dataframe
 from utils.file_manager import get_pdf_names, remove_file_and_embedding
+from utils.embedding_store import EmbeddingStore
+from utils.search import find_nearest_passages
 
 # Initialize the Flask app
 app = Flask(__name__)
@@ -31,29 +38,98 @@ app.config['EXTRACTED_DATA_FOLDER'] = 'extracted_data'
 app.config['PDF_DIRECTORY'] = 'data/pdf_files'
 app.config['MODEL_CKPT'] = 'Alibaba-NLP/gte-multilingual-base'
 app.config['K_NEIGHBORS'] = 5
+app.config['INGEST_WORKERS'] = 4  # PDFs loaded or processed in parallel
+app.config['COMPILE_MODEL'] = True  # torch.compile the model, falling back to eager if that fails
 app.secret_key = 'XXXX'  # Set the secret key to some random bytes and keep it secret in production
 
-# Ensure the data and PDF directory exists
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-os.makedirs(app.config['EXTRACTED_DATA_FOLDER'], exist_ok=True)
-os.makedirs(app.config['PDF_DIRECTORY'], exist_ok=True)
+
+class FallbackModel:
+    """
+    Runs a compiled model, switching to the eager model for good if a call fails.
+
+    torch.compile may compile again on later calls, e.g. for new input shapes,
+    so a failure then falls back like a failed warm-up instead of failing the request.
+    """
+
+    def __init__(self, compiled_model, eager_model):
+        """
+        Args:
+            compiled_model (Callable): The model compiled with torch.compile.
+            eager_model (PreTrainedModel): The model it was compiled from.
+        """
+        self.compiled_model = compiled_model
+        self.eager_model = eager_model
+
+    def __call__(self, *args, **kwargs):
+        if self.compiled_model is not None:
+            try:
+                return self.compiled_model(*args, **kwargs)
+            except Exception as e:
+                app.logger.warning(f"The compiled model failed, using the eager model from now on: {e}")
+                self.compiled_model = None
+        return self.eager_model(*args, **kwargs)
+
+
+def compile_model(model, tokenizer, device, batch_size=32):
+    """
+    Compile the model with torch.compile to fuse kernels and cut Python dispatch.
+
+    Compilation happens on the first call, so the compiled model is run here at
+    the batch sizes of queries and of embedding passages; if compiling is
+    unsupported or fails, the eager model is used instead.
+
+    Args:
+        model (PreTrainedModel): The model to compile.
+        tokenizer (PreTrainedTokenizer): The tokenizer used for the warm-up calls.
+        device (torch.device): The device (CPU/GPU) the model runs on.
+        batch_size (int): The number of passages embedded per forward pass.
+
+    Returns:
+        Callable: The compiled model falling back to the eager model, or the eager model on failure.
+    """
+    try:
+        # Padded lengths vary per batch, so compile for dynamic shapes. CUDA graphs
+        # (mode='reduce-overhead') are left out: they are re-recorded for new shapes
+        compiled_model = torch.compile(model, dynamic=True, fullgraph=False)
+        # A batch of one is specialized even with dynamic shapes, so warm up both sizes
+        for texts in (["warm-up"], ["warm-up"] * batch_size):
+            compute_embeddings(texts, tokenizer, compiled_model, device)
+    except Exception as e:
+        app.logger.warning(f"torch.compile failed, using the eager model: {e}")
+        return model
+    return FallbackModel(compiled_model, model)
+
+
+# Serializes forward passes: threads overlap PDF parsing and disk I/O, not the
+# model, and a compiled model isn't safe to run from several threads at once
+model_lock = threading.Lock()
+
 
 ## Initialization of the model and data
-# Load the model only once during the app startup.
-app.logger.info(f"Loading model {app.config['MODEL_CKPT']} on app startup...")
-try:
-    tokenizer = AutoTokenizer.from_pretrained(app.config['MODEL_CKPT'])
-    model = AutoModel.from_pretrained(app.config['MODEL_CKPT'], trust_remote_code=True)
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    model.to(device)
-    app.config.update({
-        'MODEL': model,
-        'TOKENIZER': tokenizer,
-        'DEVICE': device,
-    })
-    app.logger.info(f"Model loaded successfully")
-except Exception as e:
-    app.logger.error(f"Error loading models: {e}")
+def load_model():
+    """
+    Load the model once, during the app startup.
+
+    Returns:
+        None
+    """
+    app.logger.info(f"Loading model {app.config['MODEL_CKPT']} on app startup...")
+    try:
+        tokenizer = AutoTokenizer.from_pretrained(app.config['MODEL_CKPT'])
+        model = AutoModel.from_pretrained(app.config['MODEL_CKPT'], trust_remote_code=True)
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        model.to(device)
+        model.eval()  # Inference only, e.g. disables dropout
+        if app.config['COMPILE_MODEL']:
+            model = compile_model(model, tokenizer, device)
+        app.config.update({
+            'MODEL': model,
+            'TOKENIZER': tokenizer,
+            'DEVICE': device,
+        })
+        app.logger.info(f"Model loaded successfully")
+    except Exception as e:
+        app.logger.error(f"Error loading models: {e}")
 
 
 # Allowed file extensions
@@ -63,27 +139,160 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def save_uploaded_file(uploaded_file, path):
+    """Stream an uploaded file to disk in 1 MiB chunks, so large uploads aren't held in memory"""
+    with open(path, 'wb') as dst:
+        shutil.copyfileobj(uploaded_file.stream, dst, length=1 << 20)
+
+
+# The passages and embeddings of every indexed PDF
+embedding_store = EmbeddingStore(app.config['EXTRACTED_DATA_FOLDER'])
+
+
+def store_embeddings(embeddings, normalize=False):
+    """
+    Append the passages and embeddings of a PDF to the embedding store.
+
+    Args:
+        embeddings (Dataset): The passages of the PDF with an 'embeddings' column.
+        normalize (bool): Whether to L2-normalize the embeddings first, for
+            embeddings that may not be unit length yet.
+
+    Returns:
+        None
+    """
+    if embeddings.num_rows == 0:
+        return
+    vectors = np.asarray(embeddings.with_format('numpy', columns=['embeddings'])['embeddings'])
+    if normalize:
+        # In float32, with the epsilon of F.normalize; unit-length rows are unchanged
+        vectors = vectors.astype(np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    embedding_store.append(embeddings.remove_columns('embeddings').to_pandas(), vectors)
+
+
+def migrate_saved_datasets():
+    """
+    Move embeddings saved as one dataset per PDF, as done before the embedding
+    store existed, into the store, normalizing them like newly computed ones.
+
+    Returns:
+        None
+    """
+    dataset_paths = [
+        path for path in (
+            os.path.join(app.config['EXTRACTED_DATA_FOLDER'], file_name)
+            for file_name in os.listdir(app.config['EXTRACTED_DATA_FOLDER'])
+        )
+        if os.path.isdir(path)
+    ]
+    if not dataset_paths:
+        return
+
+    with ThreadPoolExecutor(max_workers=app.config['INGEST_WORKERS']) as pool:
+        datasets = list(pool.map(load_from_disk, dataset_paths))
+    for dataset_path, dataset in zip(dataset_paths, datasets):
+        # Datasets saved before embeddings were normalized hold raw [CLS] vectors,
+        # whose inner products aren't the cosine similarities the index ranks by
+        store_embeddings(dataset, normalize=True)
+        shutil.rmtree(dataset_path)
+        app.logger.info(f"Moved the embeddings in {dataset_path} to the embedding store")
+
+
+def load_pdf_embeddings():
+    """
+    Load the passages of all indexed PDFs from the embedding store and build
+    the FAISS index of their embeddings once, so that searches don't rebuild it.
+    Embeddings are unit length, so the index ranks by inner product, i.e. cosine
+    similarity. The index keeps the vectors in float16, halving its memory and
+    the bandwidth of each scan.
+
+    Returns:
+        Dataset: The passages of every PDF with an "embeddings" index, or None if there are none.
+    """
+    metadata, embeddings = embedding_store.load()
+    if metadata is None:
+        return None
+
+    pdf_embeddings = Dataset.from_pandas(metadata, preserve_index=False)
+    # Built straight from the memory-mapped embeddings
+    pdf_embeddings.add_faiss_index_from_external_arrays(
+        external_arrays=embeddings,
+        index_name="embeddings",
+        custom_index=faiss.IndexScalarQuantizer(
+            embeddings.shape[1], faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT
+        ),
+    )
+    return pdf_embeddings
+
+
+def set_pdf_embeddings(pdf_embeddings):
+    """
+    Cache the passages of all indexed PDFs and their FAISS index.
+
+    The dataset, the file name of each row and the PDF names are published as
+    one tuple in a single assignment, so a request never pairs the row file
+    names of one dataset with another dataset loaded concurrently.
+
+    Args:
+        pdf_embeddings (Dataset): The passages of every PDF with their index, or None if there are none.
+
+    Returns:
+        tuple: The published (pdf_embeddings, pdf_file_names, pdf_names).
+    """
+    if pdf_embeddings is not None:
+        # The file name of every row, for selecting rows without a per-row callback
+        pdf_file_names = np.asarray(pdf_embeddings['file_name'])
+    else:
+        pdf_file_names = np.asarray([], dtype=str)
+    pdf_index = (pdf_embeddings, pdf_file_names, get_pdf_names(pdf_embeddings))
+    app.config['PDF_INDEX'] = pdf_index
+    return pdf_index
+
+
+_initialized = False
+_initialize_lock = threading.Lock()
+
+
+def initialize_app():
+    """
+    Create the data folders, load the model and load the embeddings of all PDFs,
+    once per process.
+
+    This runs at startup or before the first request rather than on import, since
+    the worker processes that extract PDF pages import this module again.
+
+    Returns:
+        None
+    """
+    global _initialized
+    with _initialize_lock:
+        if _initialized:
+            return
+        # Ensure the data and PDF directory exists
+        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+        os.makedirs(app.config['EXTRACTED_DATA_FOLDER'], exist_ok=True)
+        os.makedirs(app.config['PDF_DIRECTORY'], exist_ok=True)
+        load_model()
+        # Loaded once here; kept up to date by process_and_save_file and replace_file_confirmation
+        migrate_saved_datasets()
+        set_pdf_embeddings(load_pdf_embeddings())
+        _initialized = True
+
+
 @app.before_request
 def initialize_globals():
     """
     Initialize global variables before handling each request.
 
-    This function sets up the global variables `pdf_embeddings` and `pdf_names`
-    to ensure they are initialized for every request. It loads existing PDF embeddings
-    from the extracted data directory if available.
+    This function sets up the global variables `pdf_embeddings`, `pdf_file_names`
+    and `pdf_names` from one snapshot of the embeddings cached in the app config,
+    so no request reads them from disk.
     """
-    g.pdf_embeddings = None
-
-    extracted_files = os.listdir(app.config['EXTRACTED_DATA_FOLDER'])
-    for file_name in extracted_files:
-        file_path = os.path.join(app.config['EXTRACTED_DATA_FOLDER'], file_name)
-        loaded_embeddings = load_from_disk(file_path, keep_in_memory=True)
-        if g.pdf_embeddings is None:
-            g.pdf_embeddings = loaded_embeddings
-        else:
-            g.pdf_embeddings = concatenate_datasets([g.pdf_embeddings, loaded_embeddings])
-    
-    g.pdf_names = get_pdf_names(g.pdf_embeddings)
+    # Normally done at startup; covers servers that only import the app
+    if not _initialized:
+        initialize_app()
+    g.pdf_embeddings, g.pdf_file_names, g.pdf_names = app.config['PDF_INDEX']
 
 
 # Home page route
@@ -99,6 +308,7 @@ def upload_pdfs():
     uploaded_files = request.files.getlist('pdf_files')
 
     app.logger.info(f"g.pdf_names: {g.pdf_names}")
+    new_files = []
     for uploaded_file in uploaded_files:
         if uploaded_file and allowed_file(uploaded_file.filename):
             file_name = secure_filename(uploaded_file.filename)
@@ -106,23 +316,25 @@ def upload_pdfs():
                 app.logger.warning(f"File {file_name} already exists. Prompting user for confirmation...")
                 # Store the file temporarily for potential replacement
                 temp_path = os.path.join(app.config['UPLOAD_FOLDER'], file_name)
-                uploaded_file.save(temp_path)
+                save_uploaded_file(uploaded_file, temp_path)
                 
+                # Process the new files uploaded so far before asking
+                process_and_save_files(new_files)
                 # Render a confirmation page asking for user action
                 return render_template('confirm_replace.html', file_name=file_name)
             
             # If the uploaded file is new
             file_path = os.path.join(app.config['PDF_DIRECTORY'], file_name)
-            uploaded_file.save(file_path)
-            process_and_save_file(file_path, file_name)            
-    g.pdf_names = get_pdf_names(g.pdf_embeddings)
+            save_uploaded_file(uploaded_file, file_path)
+            new_files.append((file_path, file_name))
+    process_and_save_files(new_files)
     return redirect(url_for('home'))
 
 
-def process_and_save_file(file_path, file_name):
+def extract_and_save_file(file_path, file_name):
     """
-    Process a newly uploaded PDF file and save its extracted text and
-    corresponding embeddings to the extracted data directory.
+    Extract the text of a PDF file, embed it, and add the embeddings to the
+    embedding store.
 
     Args:
         file_path (str): The file path of the uploaded PDF file.
@@ -132,19 +344,50 @@ def process_and_save_file(file_path, file_name):
         None
     """
     extracted_text = extract_information(file_path, file_name)
-    new_embeddings = generate_embeddings_for_dataframe(
-        extracted_text, app.config["TOKENIZER"], app.config["MODEL"], app.config["DEVICE"],
-    )
-
-    if g.pdf_embeddings is None:
-        g.pdf_embeddings = new_embeddings
-    else:
-        g.pdf_embeddings = concatenate_datasets([g.pdf_embeddings, new_embeddings])
-    # Future: save to json for simplicity
-    new_embeddings.save_to_disk(os.path.join(app.config["EXTRACTED_DATA_FOLDER"], file_name))
+    with model_lock:
+        new_embeddings = generate_embeddings_for_dataframe(
+            extracted_text, app.config["TOKENIZER"], app.config["MODEL"], app.config["DEVICE"],
+        )
+    store_embeddings(new_embeddings)
     app.logger.info(f"Uploaded and extracted {file_name}")
 
 
+def process_and_save_files(files):
+    """
+    Process newly uploaded PDF files in parallel, add their extracted text and
+    corresponding embeddings to the embedding store, and rebuild the search
+    index once for all of them.
+
+    Args:
+        files (list): The (file_path, file_name) pairs of the uploaded PDF files.
+
+    Returns:
+        None
+    """
+    if not files:
+        return
+
+    with ThreadPoolExecutor(max_workers=app.config['INGEST_WORKERS']) as pool:
+        list(pool.map(lambda file: extract_and_save_file(*file), files))
+
+    g.pdf_embeddings, g.pdf_file_names, g.pdf_names = set_pdf_embeddings(load_pdf_embeddings())
+
+
+def process_and_save_file(file_path, file_name):
+    """
+    Process a newly uploaded PDF file and add its extracted text and
+    corresponding embeddings to the embedding store.
+
+    Args:
+        file_path (str): The file path of the uploaded PDF file.
+        file_name (str): The name of the uploaded PDF file.
+
+    Returns:
+        None
+    """
+    process_and_save_files([(file_path, file_name)])
+
+
 @app.route('/replace', methods=['POST'])
 def replace_file_confirmation():
     """Handle user's decision to replace or keep the existing file."""
@@ -153,11 +396,12 @@ def replace_file_confirmation():
 
     temp_path = os.path.join(app.config['UPLOAD_FOLDER'], file_name)
     file_path = os.path.join(app.config['PDF_DIRECTORY'], file_name)
-    embedding_path = os.path.join(app.config['EXTRACTED_DATA_FOLDER'], file_name)
 
     if action == 'yes':
         app.logger.info(f"Replacing file {file_name}.")
-        remove_file_and_embedding(file_path, embedding_path)
+        remove_file_and_embedding(file_path, file_name, embedding_store)
+        # Reload the remaining PDFs, so the old version isn't searched if processing fails
+        g.pdf_embeddings, g.pdf_file_names, g.pdf_names = set_pdf_embeddings(load_pdf_embeddings())
         os.rename(temp_path, file_path)
         process_and_save_file(file_path, file_name)
         return redirect(url_for('home'))
@@ -170,6 +414,40 @@ def replace_file_confirmation():
     return "Invalid action.", 400
 
 
+def get_nearest_examples(query_embedding, k, file_names=None):
+    """
+    Find the PDF passages nearest to a query among the loaded PDFs.
+
+    Args:
+        query_embedding (numpy.ndarray): The embedding of the query.
+        k (int): The number of passages to return.
+        file_names (list): The PDF files to search in, or None for all of them.
+
+    Returns:
+        pandas.DataFrame: The nearest passages with their 'scores'.
+    """
+    return find_nearest_passages(
+        g.pdf_embeddings, query_embedding, k, file_names, g.pdf_file_names
+    )
+
+
+@functools.lru_cache(maxsize=256)
+def embed_query(query_text):
+    """
+    Compute the embedding of a search query, reusing it for repeated queries.
+
+    Args:
+        query_text (str): The search query text.
+
+    Returns:
+        numpy.ndarray: The query embedding, shared with the cache; don't modify it.
+    """
+    with model_lock:
+        return compute_embeddings(
+            [query_text], app.config["TOKENIZER"], app.config["MODEL"], app.config["DEVICE"],
+        ).cpu().numpy()
+
+
 # Search functionality
 @app.route('/search', methods=['POST'])
 def search():
@@ -186,23 +464,16 @@ def search():
     """
     query_text = request.form['query']
 
-    query_embedding = compute_embeddings(
-        [query_text], app.config["TOKENIZER"], app.config["MODEL"], app.config["DEVICE"],
-    ).cpu().detach().numpy()
+    query_embedding = embed_query(query_text)
 
+    # No selection searches every PDF
     selected_pdf_files = request.form.getlist('pdf_files')
-    if not selected_pdf_files:
-        selected_pdf_files = list(set(g.pdf_embeddings['file_name']))
-
-    search_embeddings = g.pdf_embeddings.filter(lambda x: x['file_name'] in selected_pdf_files)
-    search_embeddings.add_faiss_index(column="embeddings")
 
-    scores, samples = search_embeddings.get_nearest_examples(
-        "embeddings", query_embedding, k=app.config['K_NEIGHBORS']
+    search_results_df = get_nearest_examples(
+        query_embedding, app.config['K_NEIGHBORS'], selected_pdf_files
     )
-    search_results_df = pd.DataFrame.from_dict(samples)
-    search_results_df["scores"] = scores
-    search_results_df.sort_values("scores", ascending=True, inplace=True)
+    # Scores are cosine similarities, best first
+    search_results_df.sort_values("scores", ascending=False, inplace=True)
 
     search_results_list = search_results_df[
         ['file_name', 'title', 'page_in_pdf', 'text', 'scores']
@@ -214,5 +485,6 @@ def search():
 
 
 if __name__ == '__main__':
+    initialize_app()
     app.run(debug=True)
 
@@ -0,0 +1,74 @@
+"""
+Tests for the embedding store shared by all indexed PDFs.
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Add this directory to the path if running directly
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.embedding_store import EmbeddingStore
+
+
+def passages(file_name, count, dim=4):
+    """Metadata and embeddings of count passages of a PDF."""
+    metadata = pd.DataFrame({
+        "file_name": [file_name] * count,
+        "text": [f"{file_name} {i}" for i in range(count)],
+    })
+    embeddings = np.random.default_rng(count).random((count, dim), dtype=np.float32)
+    return metadata, embeddings
+
+
+@pytest.fixture
+def store(tmp_path):
+    """An empty store in a temporary folder."""
+    return EmbeddingStore(str(tmp_path))
+
+
+def test_empty_store_loads_nothing(store):
+    """Test that a new store has no passages."""
+    assert store.load() == (None, None)
+
+
+def test_append_and_load(store):
+    """Test that appended passages load back with their embeddings as float16."""
+    for file_name, count in (("a.pdf", 3), ("b.pdf", 2)):
+        store.append(*passages(file_name, count))
+
+    metadata, embeddings = store.load()
+    assert metadata["file_name"].tolist() == ["a.pdf"] * 3 + ["b.pdf"] * 2
+    assert embeddings.dtype == np.float16
+    np.testing.assert_allclose(embeddings[3:], passages("b.pdf", 2)[1], atol=1e-3)
+
+
+def test_append_without_passages(store):
+    """Test that a PDF without extractable text is skipped rather than failing."""
+    store.append(pd.DataFrame({"file_name": [], "text": []}), np.asarray([]))
+    assert store.load() == (None, None)
+
+    store.append(*passages("a.pdf", 2))
+    store.append(pd.DataFrame({"file_name": [], "text": []}), np.asarray([]))
+    metadata, embeddings = store.load()
+    assert len(metadata) == 2
+    assert embeddings.shape == (2, 4)
+
+
+def test_remove_compacts_store(store):
+    """Test that removing a PDF keeps the other passages and their embeddings."""
+    store.append(*passages("a.pdf", 3))
+    store.append(*passages("b.pdf", 2))
+
+    store.remove("a.pdf")
+
+    metadata, embeddings = store.load()
+    assert metadata["file_name"].tolist() == ["b.pdf"] * 2
+    np.testing.assert_allclose(embeddings, passages("b.pdf", 2)[1], atol=1e-3)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
@@ -0,0 +1,67 @@
+"""
+Tests for restricting passage searches to selected PDFs.
+"""
+import os
+import sys
+from unittest.mock import Mock
+
+import faiss
+import numpy as np
+import pytest
+from datasets import Dataset
+
+# Add this directory to the path if running directly
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.search import find_nearest_passages
+
+
+@pytest.fixture
+def passages():
+    """Four passages of two PDFs, indexed like the app indexes the embedding store."""
+    file_names = np.asarray(["a.pdf", "a.pdf", "b.pdf", "b.pdf"])
+    dataset = Dataset.from_dict({
+        "file_name": file_names.tolist(),
+        "text": ["a one", "a two", "b one", "b two"],
+    })
+    embeddings = np.eye(4, dtype=np.float32)
+    dataset.add_faiss_index_from_external_arrays(
+        external_arrays=embeddings,
+        index_name="embeddings",
+        custom_index=faiss.IndexFlatIP(4),
+    )
+    return dataset, file_names
+
+
+def test_search_all_pdfs(passages):
+    """Test that without a selection every PDF is searched."""
+    dataset, file_names = passages
+    results = find_nearest_passages(dataset, np.eye(4, dtype=np.float32)[2], k=1)
+    assert results["text"].tolist() == ["b one"]
+    assert results["scores"].tolist() == pytest.approx([1.0])
+
+
+def test_search_selected_pdfs(passages):
+    """Test that only the selected PDFs are searched, and k is capped at their passages."""
+    dataset, file_names = passages
+    results = find_nearest_passages(
+        dataset, np.eye(4, dtype=np.float32)[2], k=5, file_names=["a.pdf"], row_file_names=file_names
+    )
+    assert sorted(results["text"]) == ["a one", "a two"]
+    assert set(results["file_name"]) == {"a.pdf"}
+
+
+def test_search_empty_selection():
+    """Test that a selection without passages returns no results without searching."""
+    dataset = Mock(column_names=["file_name", "text"])
+    results = find_nearest_passages(
+        dataset, np.ones(4, dtype=np.float32), k=5,
+        file_names=["missing.pdf"], row_file_names=np.asarray(["a.pdf", "b.pdf"]),
+    )
+    assert results.empty
+    assert results.columns.tolist() == ["file_name", "text", "scores"]
+    dataset.get_nearest_examples.assert_not_called()
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v"]))
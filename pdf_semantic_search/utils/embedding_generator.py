@@ -3,6 +3,8 @@ from datasets import Dataset
 # For Type Annotations, better use the base classes below over Auto...
 from transformers import PreTrainedTokenizer, PreTrainedModel
 import torch
+import torch.nn.functional as F
+import numpy as np
 import pandas as pd
 
 
@@ -16,11 +18,20 @@ def create_features_from_dataframe(df: pd.DataFrame) -> Dataset:
     Returns:
         Dataset: A HuggingFace Dataset with a 'data' column combining 'title' and 'text'.
     """
-    dataset = Dataset.from_pandas(df)
-    dataset = dataset.map(
-        lambda x: {'data': f"{x['title']} \n {x['text']}"}
-    )
-    return dataset
+    return Dataset.from_pandas(add_data_column(df))
+
+
+def add_data_column(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds a 'data' column combining 'title' and 'text', using vectorized string operations.
+
+    Args:
+        df (pandas.DataFrame): The input dataframe containing columns for 'title' and 'text'.
+
+    Returns:
+        pandas.DataFrame: A copy of the dataframe with the 'data' column added.
+    """
+    return df.assign(data=df['title'].astype(str) + " \n " + df['text'].astype(str))
 
 
 def extract_cls_embedding(model_output) -> torch.Tensor:
@@ -31,13 +42,15 @@ def extract_cls_embedding(model_output) -> torch.Tensor:
         model_output (ModelOutput): The output from the transformer model.
 
     Returns:
-        torch.Tensor: The [CLS] token embedding.
+        torch.Tensor: The [CLS] token embedding, copied into a contiguous tensor.
     """
-    return model_output.last_hidden_state[:, 0]
+    # Copy the strided slice once on the device rather than during the transfer
+    return model_output.last_hidden_state[:, 0].contiguous()
 
 
 def compute_embeddings(
-    text_list: list, tokenizer: PreTrainedTokenizer, model: PreTrainedModel, device: torch.device
+    text_list: list, tokenizer: PreTrainedTokenizer, model: PreTrainedModel, device: torch.device,
+    dtype: torch.dtype = torch.float32,
 ) -> torch.Tensor:
     """
     Computes the embeddings for a list of texts using the provided tokenizer and model.
@@ -47,20 +60,36 @@ def compute_embeddings(
         tokenizer (PreTrainedTokenizer): The tokenizer to encode the texts.
         model (PreTrainedModel): The model to generate embeddings.
         device (torch.device): The device (CPU/GPU) on which the model should run.
+        dtype (torch.dtype): The dtype of the returned embeddings. FAISS queries need float32.
 
     Returns:
-        torch.Tensor: The embeddings for the input texts.
+        torch.Tensor: The L2-normalized embeddings for the input texts, so that
+            their inner product is the cosine similarity.
     """
     encoded_input = tokenizer(
         text_list, padding=True, truncation=True, return_tensors="pt"
-    ).to(device)
-
-    model_output = model(**encoded_input)
-    return extract_cls_embedding(model_output)
+    )
+    if device.type == 'cuda':
+        # Copy from pinned memory so the transfer runs asynchronously with GPU work
+        encoded_input = {
+            key: value.pin_memory().to(device, non_blocking=True)
+            for key, value in encoded_input.items()
+        }
+    else:
+        encoded_input = encoded_input.to(device)
+
+    # Inference only: skip autograd bookkeeping, and use half precision on GPU
+    with torch.inference_mode(), torch.autocast(
+        device_type=device.type, dtype=torch.float16, enabled=(device.type == 'cuda')
+    ):
+        model_output = model(**encoded_input)
+    # Normalize in float32, then cast on the device so less data is copied back
+    return F.normalize(extract_cls_embedding(model_output).float(), p=2, dim=1).to(dtype)
 
 
 def generate_embeddings_for_dataframe(
     df: pd.DataFrame, tokenizer: PreTrainedTokenizer, model: PreTrainedModel, device: torch.device,
+    batch_size: int = 32,
 ) -> Dataset:
     """
     Generates embeddings for a dataframe of text data by combining 'title' and 'text' columns.
@@ -70,13 +99,28 @@ def generate_embeddings_for_dataframe(
         tokenizer (PreTrainedTokenizer): The tokenizer to encode the texts.
         device (torch.device): The device (CPU/GPU) on which the model should run.
         model (PreTrainedModel): The model used to generate embeddings.
+        batch_size (int): The number of rows encoded per forward pass.
 
     Returns:
-        Dataset: A HuggingFace Dataset with an 'embeddings' column containing the computed embeddings.
+        Dataset: A HuggingFace Dataset with an 'embeddings' column containing the computed
+            embeddings as float16.
     """
-    dataset = create_features_from_dataframe(df)
-    embeddings_dataset = dataset.map(
-        lambda x: {'embeddings': compute_embeddings(
-            x['data'], tokenizer, model, device).detach().cpu().numpy()[0]}
-    )
-    return embeddings_dataset
+    df = add_data_column(df)
+    texts = df['data'].tolist()
+
+    # Encode fixed-size chunks straight into one array, skipping Dataset.map passes
+    embeddings = None
+    for start in range(0, len(texts), batch_size):
+        # Stored as float16 to halve the size on disk and in memory
+        batch_embeddings = compute_embeddings(
+            texts[start:start + batch_size], tokenizer, model, device, dtype=torch.float16
+        ).cpu().numpy()
+        if embeddings is None:
+            embeddings = np.empty((len(texts), batch_embeddings.shape[1]), dtype=np.float16)
+        embeddings[start:start + len(batch_embeddings)] = batch_embeddings
+
+    # Keep the 'data' column so the features match the datasets already saved
+    return Dataset.from_dict({
+        **df.to_dict(orient='list'),
+        'embeddings': embeddings if embeddings is not None else [],
+    })
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+logger = logging.getLogger(__name__)
+
+CHUNK_ROWS = 1024  # The embeddings file grows by this many rows at a time
+
+
+class EmbeddingStore:
+    """
+    Stores the passages and embeddings of all indexed PDFs in one folder.
+
+    The embeddings are kept as float16 in a single raw file that is memory-mapped,
+    so loading it parses nothing, and that grows in chunks of CHUNK_ROWS rows. The
+    other columns are kept in a parquet file. A small JSON header records how many
+    rows are valid and is written last, so an interrupted append is ignored.
+    """
+
+    def __init__(self, folder):
+        """
+        Args:
+            folder (str): The directory holding the store's files.
+        """
+        self.embeddings_path = os.path.join(folder, "embeddings.bin")
+        self.metadata_path = os.path.join(folder, "metadata.parquet")
+        self.header_path = os.path.join(folder, "embeddings.json")
+        self._lock = threading.Lock()
+
+    def _read_header(self):
+        if not os.path.exists(self.header_path):
+            return {"rows": 0, "dim": None, "capacity": 0}
+        with open(self.header_path) as f:
+            return json.load(f)
+
+    def _write_header(self, header):
+        tmp_path = f"{self.header_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(header, f)
+        os.replace(tmp_path, self.header_path)
+
+    def _read_metadata(self, rows):
+        # The parquet file may hold rows of an interrupted append past the header
+        return pd.read_parquet(self.metadata_path).iloc[:rows].reset_index(drop=True)
+
+    def _write_metadata(self, metadata):
+        tmp_path = f"{self.metadata_path}.tmp"
+        metadata.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, self.metadata_path)
+
+    def _map_embeddings(self, header, mode="r"):
+        return np.memmap(
+            self.embeddings_path, dtype=np.float16, mode=mode,
+            shape=(header["rows"] if mode == "r" else header["capacity"], header["dim"]),
+        )
+
+    def load(self):
+        """
+        Load the passages and embeddings of all indexed PDFs.
+
+        Returns:
+            tuple: The passages (pandas.DataFrame) and their embeddings
+                (numpy.memmap of float16, one row per passage), or (None, None) if the store is empty.
+        """
+        header = self._read_header()
+        if header["rows"] == 0:
+            return None, None
+        return self._read_metadata(header["rows"]), self._map_embeddings(header)
+
+    def append(self, metadata, embeddings):
+        """
+        Append the passages of a PDF and their embeddings.
+
+        Args:
+            metadata (pandas.DataFrame): The passages, one row per embedding.
+            embeddings (numpy.ndarray): The embeddings, one row per passage.
+
+        Returns:
+            None
+        """
+        # A PDF without extractable text, e.g. a scan, has no passages to store
+        if len(embeddings) == 0:
+            return
+        with self._lock:
+            header = self._read_header()
+            rows, dim = header["rows"], embeddings.shape[1]
+            if header["dim"] not in (None, dim):
+                raise ValueError(f"Expected embeddings of dimension {header['dim']}, got {dim}")
+
+            capacity = header["capacity"]
+            if rows + len(embeddings) > capacity:
+                capacity = -(-(rows + len(embeddings)) // CHUNK_ROWS) * CHUNK_ROWS
+                with open(self.embeddings_path, "ab") as f:
+                    f.truncate(capacity * dim * np.dtype(np.float16).itemsize)
+
+            stored = self._map_embeddings({"capacity": capacity, "dim": dim}, mode="r+")
+            stored[rows:rows + len(embeddings)] = embeddings
+            stored.flush()
+            del stored
+
+            if rows:
+                metadata = pd.concat([self._read_metadata(rows), metadata], ignore_index=True)
+            self._write_metadata(metadata)
+            self._write_header({"rows": rows + len(embeddings), "dim": dim, "capacity": capacity})
+
+    def remove(self, file_name):
+        """
+        Remove the passages and embeddings of a PDF, compacting the store.
+
+        Args:
+            file_name (str): The name of the PDF file.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            header = self._read_header()
+            if header["rows"] == 0:
+                return
+            metadata = self._read_metadata(header["rows"])
+            keep = (metadata["file_name"] != file_name).to_numpy()
+            if keep.all():
+                return
+
+            embeddings = np.asarray(self._map_embeddings(header)[keep])
+            header = {
+                "rows": len(embeddings),
+                "dim": header["dim"],
+                "capacity": max(-(-len(embeddings) // CHUNK_ROWS), 1) * CHUNK_ROWS,
+            }
+            # Write a new file, so arrays already mapped from the old one stay valid
+            tmp_path = f"{self.embeddings_path}.tmp"
+            stored = np.memmap(tmp_path, dtype=np.float16, mode="w+", shape=(header["capacity"], header["dim"]))
+            stored[:len(embeddings)] = embeddings
+            stored.flush()
+            del stored
+            os.replace(tmp_path, self.embeddings_path)
+
+            self._write_metadata(metadata[keep].reset_index(drop=True))
+            self._write_header(header)
+            logger.info(f"Removed {int((~keep).sum())} embeddings of {file_name}")
@@ -1,5 +1,4 @@
 #!/usr/bin/env python3
-import shutil
 import os
 import logging
 from datasets import Dataset
@@ -8,16 +7,20 @@ from datasets import Dataset
 logger = logging.getLogger(__name__)
 
 
-def remove_file_and_embedding(file_path, embedding_path):
+def remove_file_and_embedding(file_path, file_name, embedding_store):
     if os.path.exists(file_path):
         os.remove(file_path)
-        shutil.rmtree(embedding_path)
+        embedding_store.remove(file_name)
         logger.info(
-            f"Removed existing file {file_path} and embeddings {embedding_path}")
+            f"Removed existing file {file_path} and its embeddings")
 
 
 def get_pdf_names(dataset: Dataset):
     """Helper function to update the list of PDF names from the embeddings data."""
-    if dataset is not None:
-        return list(set(dataset["file_name"]))
-    return []
+    if dataset is None:
+        return []
+    if dataset._indices is None:
+        # Unique over the Arrow column, without creating a Python string per row
+        return dataset.data.column("file_name").unique().to_pylist()
+    # With an indices mapping (e.g. after select), the Arrow table also holds unselected rows
+    return list(set(dataset["file_name"]))
@@ -5,14 +5,17 @@ read_pdf.py
 This module contains functions for processing PDF files converted from OneNote pages. 
 OneNote pages generally contain a title followed by the date and time the page was created,
 with content organized in bullet points. This module provides functionality to extract text 
-from a given PDF document. The `pypdf` library is used for PDF reading and extraction.
+from a given PDF document. The `pypdfium2` library is used for PDF reading and extraction.
 
 Functions:
     - extract_information(pdf_path): Extracts textual information from the PDF file located at the 
       given path. Returns the extracted text as a DataFrame or raises an error if the PDF cannot be processed.
+    - extract_information_arrow(pdf_path, file_name): Same as extract_information, as an Arrow table.
+    - iter_paragraphs(pdf_path, file_name): Generates the same rows one paragraph at a time, as dicts.
+    - extract_information_many(pdf_paths): Coroutine extracting many PDF files concurrently.
 
 Dependencies:
-    - pypdf: Required for reading and extracting content from PDF files.
+    - pypdfium2: Required for reading and extracting content from PDF files.
     
 Usage:
     - Import this module in other parts of the application where PDF processing is needed.
@@ -25,13 +28,44 @@ Date: 202412
 """
 
 import re
+import os
+import asyncio
+import mmap
+import ctypes
 import logging
+import multiprocessing
+import functools
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
 import pandas as pd
-from pypdf import PdfReader
+import pyarrow as pa
+import pypdfium2 as pdfium
 
 # Create a logger for this file
 logger = logging.getLogger(__name__)
 
+# The creation date under each title contains the weekday
+_WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+# Bullet points, e.g. "a." or "1.", separate the paragraphs
+_PARA_SPLIT_RE = re.compile(r'\b\w\.\n?')
+# Tabs and other stray whitespace become spaces, then runs of spaces a single space
+_WHITESPACE_TABLE = str.maketrans('\t\r\v\f', '    ')
+_SPACES_RE = re.compile(r' {2,}')
+# Arrow strings stay in Arrow buffers when converted to pandas
+_ARROW_DTYPES = {pa.large_string(): pd.ArrowDtype(pa.large_string())}
+
+# Pages extracted per worker task; PDFs with no more pages are read in-process
+PAGES_PER_TASK = 16
+
+# pdfium is not thread-safe, so in-process calls are serialized; workers are single-threaded
+_pdfium_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+# The numba-compiled bullet scan, compiled on first use; False if numba isn't installed
+_jit_splitter = None
+_jit_lock = threading.Lock()
+
 
 def find_title(text):
     """
@@ -44,11 +78,19 @@ def find_title(text):
     Returns:
         str: The title of the page or None if the title cannot be determined.
     """
-    weekday_match = re.search(
-        r'(Monday|Tuesday|Wednesday|Thursday|Friday|Saturday|Sunday)', text)
-    if weekday_match:
-        # Title ends right before the weekday name
-        title_end = weekday_match.start() - 1
+    # A literal scan per weekday is cheaper than a regex alternation
+    weekday_start = -1
+    for weekday in _WEEKDAYS:
+        if weekday_start == -1:
+            weekday_start = text.find(weekday)
+        else:
+            # Once a weekday is found, only look for weekdays starting before it
+            pos = text.find(weekday, 0, weekday_start + len(weekday) - 1)
+            if pos != -1:
+                weekday_start = pos
+    if weekday_start != -1:
+        # Title ends right before the earliest weekday name
+        title_end = weekday_start - 1
         # Find the start of the title by searching for the first newline before the weekday
         title_start = text.rfind('\n', 0, title_end) + 1
         title = text[title_start:title_end+1].strip()
@@ -56,11 +98,288 @@ def find_title(text):
     return None
 
 
+def _find_bullets(codes):
+    """
+    Finds the bullet points matched by _PARA_SPLIT_RE in ASCII text.
+    Compiled with numba, as a manual scan since numba doesn't support regexes.
+
+    Parameters:
+        codes (np.ndarray): The ASCII codes of the text.
+
+    Returns:
+        np.ndarray: The start and end offsets of each bullet point, interleaved.
+    """
+    n = len(codes)
+    offsets = np.empty(n, dtype=np.int64)  # Each bullet spans at least two characters
+    count = 0
+    i = 0
+    while i < n - 1:
+        # A word character after a word boundary, followed by a dot and an optional newline
+        if _is_word(codes[i]) and codes[i + 1] == 46 and (i == 0 or not _is_word(codes[i - 1])):
+            end = i + 3 if i + 2 < n and codes[i + 2] == 10 else i + 2
+            offsets[count] = i
+            offsets[count + 1] = end
+            count += 2
+            i = end
+        else:
+            i += 1
+    return offsets[:count]
+
+
+def _is_word(code):
+    """
+    Returns whether an ASCII code is a word character, i.e. matches \\w.
+    """
+    return (48 <= code <= 57) or (65 <= code <= 90) or (97 <= code <= 122) or code == 95
+
+
+def _get_jit_splitter():
+    """
+    Returns _find_bullets compiled with numba, or False if numba isn't installed.
+    numba is imported on first use rather than with this module, as importing it is slow;
+    compiled code is cached on disk next to this file, so later processes skip compiling it.
+    """
+    global _jit_splitter, _is_word
+    if _jit_splitter is None:
+        with _jit_lock:
+            if _jit_splitter is None:
+                try:
+                    from numba import njit
+                except ImportError:  # Optional: paragraphs are split with the regex instead
+                    _jit_splitter = False
+                else:
+                    jit = njit(cache=True, fastmath=True)
+                    # _find_bullets calls the compiled _is_word, so compile that one first
+                    _is_word = jit(_is_word)
+                    _jit_splitter = jit(_find_bullets)
+    return _jit_splitter
+
+
+def split_paragraphs(text):
+    """
+    Splits the text of a page into paragraphs at the bullet points, like _PARA_SPLIT_RE.split.
+    ASCII text is scanned by a numba-compiled function when numba is installed.
+
+    Parameters:
+        text (str): The textual content of the PDF page.
+
+    Returns:
+        list: The paragraphs, including empty ones.
+    """
+    if not text.isascii() or not (find_bullets := _get_jit_splitter()):
+        return _PARA_SPLIT_RE.split(text)
+
+    offsets = find_bullets(np.frombuffer(text.encode('ascii'), dtype=np.uint8)).tolist()
+    bounds = [0, *offsets, len(text)]
+    return [text[start:end] for start, end in zip(bounds[::2], bounds[1::2])]
+
+
+def _get_executor():
+    """
+    Returns the process pool used to extract pages, creating it on first use.
+    Workers are started by a fork server where available, or spawned, rather than
+    forked from the calling process, whose other threads may hold locks (e.g. in pdfium).
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _executor = ProcessPoolExecutor(
+                max_workers=os.cpu_count(), mp_context=multiprocessing.get_context(start_method))
+        return _executor
+
+
+def _process_page(page):
+    """
+    Extracts the title and the paragraphs of a PDF page.
+
+    Parameters:
+        page (pdfium.PdfPage): The page, which is closed afterwards.
+
+    Returns:
+        tuple: The title of the page (or None) and the list of its paragraphs.
+    """
+    textpage = page.get_textpage()
+    text = textpage.get_text_range()
+    # Close each page as we go to bound memory
+    textpage.close()
+    page.close()
+
+    # Blank pages have no title or paragraphs, so skip the parsing below
+    if not text or text.isspace():
+        return None, []
+
+    # pdfium ends lines with '\r\n'
+    text = text.replace('\r\n', '\n')
+    # Normalize whitespace once per page rather than per paragraph
+    text = _SPACES_RE.sub(' ', text.translate(_WHITESPACE_TABLE))
+
+    # Clean the text by removing bullet points and splitting it into paragraphs
+    return find_title(text), _strip_paras(text)
+
+
+def _strip_paras(text):
+    """
+    Returns the non-empty paragraphs of a page, stripped once each.
+
+    Parameters:
+        text (str): The textual content of the PDF page.
+
+    Returns:
+        list: The stripped paragraphs.
+    """
+    # map runs str.strip from C, leaving a single comprehension step per paragraph
+    return [para for para in map(str.strip, split_paragraphs(text)) if para]
+
+
+@functools.lru_cache(maxsize=32)
+def _get_document(file_path, mtime_ns, size):
+    """
+    Returns the parsed PDF document, reused while the file is unchanged.
+    The modification time and size are part of the cache key, so a replaced file is parsed again.
+    """
+    with open(file_path, 'rb') as f:
+        # Copy-on-write only so that ctypes can wrap the mapping; it is never written
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    # pdfium reads the mapped pages in place, and the document keeps the mapping alive
+    return pdfium.PdfDocument((ctypes.c_char * len(mapped)).from_buffer(mapped))
+
+
+def _open_document(file_path):
+    """
+    Opens a PDF document through the cache of parsed documents.
+
+    Parameters:
+        file_path (str): The file path to the PDF document.
+
+    Returns:
+        pdfium.PdfDocument: The parsed PDF document.
+    """
+    stat = os.stat(file_path)
+    return _get_document(file_path, stat.st_mtime_ns, stat.st_size)
+
+
+def _process_pages(args):
+    """
+    Extracts the titles and the paragraphs of a range of PDF pages.
+    Each call opens the PDF itself, so that worker processes don't receive it pickled;
+    the parsed document is cached, so later ranges of the same PDF reuse it.
+
+    Parameters:
+        args (tuple): The file path to the PDF document, and the first and the end page index.
+
+    Returns:
+        list: The (title, paragraphs) of each page in the range, in page order.
+    """
+    file_path, start, stop = args
+    get_page, process_page = _open_document(file_path).get_page, _process_page
+    return [process_page(get_page(i)) for i in range(start, stop)]
+
+
+def _iter_page_contents(file_path, use_workers=False):
+    """
+    Generates the title and the paragraphs of each page of a PDF, in page order.
+    Pages of long PDFs are extracted in parallel by worker processes.
+
+    Parameters:
+        file_path (str): The file path to the PDF document.
+        use_workers (bool): Whether to extract short PDFs in worker processes too,
+                            rather than in-process under the pdfium lock.
+
+    Yields:
+        tuple: The title of the page (or None) and the list of its paragraphs.
+    """
+    with _pdfium_lock:
+        page_count = len(_open_document(file_path))
+
+    page_ranges = [
+        (file_path, start, min(start + PAGES_PER_TASK, page_count))
+        for start in range(0, page_count, PAGES_PER_TASK)
+    ]
+    if use_workers or len(page_ranges) > 1:
+        # Results come back in order as the workers finish each range
+        for pages in _get_executor().map(_process_pages, page_ranges):
+            yield from pages
+    else:
+        # Don't hold the lock while suspended in the caller
+        with _pdfium_lock:
+            pages = _process_pages(page_ranges[0]) if page_ranges else []
+        yield from pages
+
+
+def _iter_pages(pages):
+    """
+    Numbers the titles of the extracted pages.
+    Titles carry over to the following pages, so pages must be given in page order.
+
+    Parameters:
+        pages (iterable): The (title, paragraphs) of each page.
+
+    Yields:
+        tuple: The title index, title, page number and paragraphs of a page.
+    """
+    current_title = ''
+    title_index = 0
+
+    for i, (title, paragraphs) in enumerate(pages):
+        # Update the current title if a new title is found
+        if title:
+            current_title = title
+            title_index += 1
+
+        yield title_index, current_title, i + 1, paragraphs
+
+
+def _extract_table(file_path, use_workers=False):
+    """
+    Extracts the paragraphs of a PDF file into an Arrow table, one row per paragraph.
+
+    Parameters:
+        file_path (str): The file path to the PDF document.
+        use_workers (bool): Whether to extract short PDFs in worker processes too.
+
+    Returns:
+        pa.Table: The table with columns 'page_in_on', 'title', 'page_in_pdf', 'paragraph', 'text'.
+    """
+    title_indices, titles, page_numbers, counts, texts = [], [], [], [], []
+    # Bind the methods once, rather than looking them up for every page
+    add_title_index, add_title, add_page_number = title_indices.append, titles.append, page_numbers.append
+    add_count, add_texts = counts.append, texts.extend
+    for title_index, title, page_number, paragraphs in _iter_pages(_iter_page_contents(file_path, use_workers)):
+        add_title_index(title_index)
+        add_title(title)
+        add_page_number(page_number)
+        add_count(len(paragraphs))
+        add_texts(paragraphs)
+
+    # Build the columns directly, repeating the values of each page for its paragraphs
+    counts = np.asarray(counts, dtype=np.int64)
+    first_rows = np.cumsum(counts) - counts
+    page_of_row = np.repeat(np.arange(len(counts)), counts)
+    # Strings are kept in Arrow arrays, i.e. contiguous buffers rather than Python objects
+    return pa.table({
+        'page_in_on': np.asarray(title_indices, dtype=np.int32)[page_of_row],
+        'title': pa.array(titles, type=pa.large_string()).take(page_of_row),
+        'page_in_pdf': np.asarray(page_numbers, dtype=np.int32)[page_of_row],
+        'paragraph': (np.arange(len(texts)) - first_rows[page_of_row] + 1).astype(np.int32),
+        'text': pa.array(texts, type=pa.large_string()),
+    })
+
+
+def _to_pandas(table):
+    """
+    Converts an extracted table to a DataFrame without copying the strings into Python objects.
+    """
+    return table.to_pandas(types_mapper=_ARROW_DTYPES.get)
+
+
 def extract_text(file_path):
     """
     Extracts text from a PDF file converted from OneNote pages.
     The PDF content is parsed and split into a DataFrame where each row contains a page title, 
     the corresponding page number, and the paragraphs of text.
+    Pages of long PDFs are extracted in parallel by worker processes. Parsed documents
+    are cached, so extracting an unchanged file again skips parsing it.
 
     Parameters:
         file_path (str): The file path to the PDF document.
@@ -69,36 +388,68 @@ def extract_text(file_path):
         pd.DataFrame: A DataFrame containing the extracted information with columns: 
                       'page_in_on', 'title', 'page_in_pdf', 'paragraph', 'text'.
     """
-    reader = PdfReader(file_path)
-    pages = reader.pages
+    return _to_pandas(_extract_table(file_path))
 
-    extracted_data = []  # List to store the extracted data
 
-    current_title = ''
-    title_index = 0
+def iter_paragraphs(pdf_path, file_name):
+    """
+    Generates the rows of extract_information one paragraph at a time, without building a DataFrame.
+    Useful for pipelines that chunk or embed the paragraphs as they are extracted,
+    e.g. to start embedding the first pages while later pages are still being parsed:
 
-    for i, page in enumerate(pages):
-        text = page.extract_text()
-        title = find_title(text)
+        for row in iter_paragraphs('path/to/file.pdf', 'file.pdf'):
+            batch.append(row['text'])
+
+    Parameters:
+        pdf_path (str): The path to the PDF document.
+        file_name (str): The name of the PDF file, stored in each row.
+
+    Yields:
+        dict: A paragraph, with keys 'page_in_on', 'title', 'page_in_pdf', 'paragraph', 'text'
+              and 'file_name'.
+    """
+    for title_index, title, page_number, paragraphs in _iter_pages(_iter_page_contents(pdf_path)):
+        for paragraph, text in enumerate(paragraphs, 1):
+            yield {
+                'page_in_on': title_index,
+                'title': title,
+                'page_in_pdf': page_number,
+                'paragraph': paragraph,
+                'text': text,
+                'file_name': file_name,
+            }
 
-        # Update the current title if a new title is found
-        if title:
-            current_title = title
-            title_index += 1
 
-        # Clean the text by removing bullet points and splitting it into paragraphs
-        paragraphs = [para for para in re.split(
-            r'\b\w\.\n?', text) if para.strip()]
+def extract_information_arrow(pdf_path, file_name):
+    """
+    Extracts information from the provided PDF file into an Arrow table.
 
-        # Add each paragraph as a new row in the extracted data list
-        for j, paragraph in enumerate(paragraphs):
-            extracted_data.append(
-                (title_index, current_title, i + 1, j + 1, paragraph))
+    Batch callers should prefer this over extract_information and combine the tables of
+    several files with pa.concat_tables, which doesn't copy the string data as pd.concat does.
 
-    # Convert the list of extracted data into a pandas DataFrame
-    df = pd.DataFrame(extracted_data, columns=[
-                      'page_in_on', 'title', 'page_in_pdf', 'paragraph', 'text'])
-    return df
+    Parameters:
+        pdf_path (str): The path to the PDF document.
+        file_name (str): The name of the PDF file, stored in each row.
+
+    Returns:
+        pa.Table: The extracted text, organized by titles, page numbers, and paragraphs,
+                  with a 'file_name' column.
+    """
+    return _extract_information_arrow(pdf_path, file_name)
+
+
+def _extract_information_arrow(pdf_path, file_name, use_workers=False):
+    """
+    Extracts information from the provided PDF file into an Arrow table, like
+    extract_information_arrow, optionally extracting short PDFs in worker processes too.
+    """
+    try:
+        table = _extract_table(pdf_path, use_workers)
+        return table.append_column(
+            'file_name', pa.repeat(pa.scalar(file_name, type=pa.large_string()), table.num_rows))
+    except Exception as e:
+        raise Exception(
+            f"An error occurred while extracting information from the PDF: {str(e)}")
 
 
 def extract_information(pdf_path, file_name):
@@ -113,10 +464,35 @@ def extract_information(pdf_path, file_name):
     Returns:
         pd.DataFrame: A DataFrame containing the extracted text, organized by titles, page numbers, and paragraphs.
     """
-    try:
-        df = extract_text(pdf_path)
-        df['file_name'] = file_name
-        return df
-    except Exception as e:
-        raise Exception(
-            f"An error occurred while extracting information from the PDF: {str(e)}")
+    return _to_pandas(extract_information_arrow(pdf_path, file_name))
+
+
+def _extract_information_many_file(pdf_path, file_name):
+    """
+    Extracts one file for extract_information_many, parsing its pages in worker processes.
+    """
+    return _to_pandas(_extract_information_arrow(pdf_path, file_name, use_workers=True))
+
+
+async def extract_information_many(pdf_paths, max_workers=None):
+    """
+    Extracts information from many PDF files concurrently.
+
+    The pages of every file, however short, are parsed by the worker processes of
+    extract_text, so several files are parsed at once. Each file waits for its pages
+    and builds its DataFrame on a thread; only counting its pages takes the pdfium lock.
+
+    Parameters:
+        pdf_paths (list): The (pdf_path, file_name) of each PDF file.
+        max_workers (int): The number of threads, by default that of ThreadPoolExecutor.
+
+    Returns:
+        list: The DataFrame of each PDF file, as returned by extract_information, in the given order.
+    """
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        tasks = [
+            loop.run_in_executor(pool, _extract_information_many_file, pdf_path, file_name)
+            for pdf_path, file_name in pdf_paths
+        ]
+        return await asyncio.gather(*tasks)
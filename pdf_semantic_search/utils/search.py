@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+import faiss
+import numpy as np
+import pandas as pd
+from datasets import Dataset
+
+
+def find_nearest_passages(dataset: Dataset, query_embedding, k, file_names=None, row_file_names=None):
+    """
+    Find the PDF passages nearest to a query in the dataset's 'embeddings' FAISS index.
+
+    When searching only some PDFs, the rows of those PDFs are found with a
+    vectorized mask over the file names and the search is restricted to them.
+
+    Args:
+        dataset (Dataset): The passages, with a FAISS index named 'embeddings'.
+        query_embedding (numpy.ndarray): The embedding of the query.
+        k (int): The number of passages to return.
+        file_names (list): The PDF files to search in, or None for all of them.
+        row_file_names (numpy.ndarray): The file name of each row of the dataset,
+            needed when file_names is given.
+
+    Returns:
+        pandas.DataFrame: The nearest passages with their 'scores'; empty if the
+            selected PDFs have no passages.
+    """
+    search_kwargs = {}
+    if file_names:
+        row_ids = np.nonzero(np.isin(row_file_names, np.asarray(file_names)))[0].astype('int64')
+        if not len(row_ids):
+            # FAISS can't search for zero neighbors
+            return pd.DataFrame(columns=[*dataset.column_names, "scores"])
+        # The selector reads row_ids through a raw pointer, so row_ids must outlive the search
+        selector = faiss.IDSelectorArray(len(row_ids), faiss.swig_ptr(row_ids))
+        search_kwargs['params'] = faiss.SearchParameters(sel=selector)
+        k = min(k, len(row_ids))
+
+    scores, samples = dataset.get_nearest_examples(
+        "embeddings", query_embedding, k=k, **search_kwargs
+    )
+    results_df = pd.DataFrame.from_dict(samples)
+    results_df["scores"] = scores
+    return results_df